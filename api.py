@@ -0,0 +1,359 @@
+from datetime import datetime
+from flask import Blueprint, Response, abort, current_app, jsonify, request, stream_with_context
+from sqlalchemy.exc import IntegrityError
+from models import db, Venue, Artist, Show, VenueGenre, ArtistGenre
+from forms import MAX_SCHEDULE_SHOWS, parse_local_datetime
+from queries import upcoming_shows_count, past_shows_count, check_show_batch, insert_shows, show_tags, artist_albums, paginate, listing_last_modified, venue_last_modified, artist_last_modified
+from cache import conditional
+from export import EXPORTS, FORMATS, export_batches
+import search
+
+#----------------------------------------------------------------------------#
+# API.
+#----------------------------------------------------------------------------#
+
+# JSON mirror of the HTML routes under /api/v1. Rows are read as plain
+# tuples holding only the requested ?fields=, so no ORM objects are built
+# and unrequested subqueries such as show counts are never run.
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def venue_columns(now):
+    # Venue fields read straight from columns
+    return {
+        'id': Venue.id,
+        'name': Venue.name,
+        'city': Venue.city,
+        'state': Venue.state,
+        'address': Venue.address,
+        'phone': Venue.phone,
+        'image_link': Venue.image_link,
+        'website_link': Venue.website_link,
+        'facebook_link': Venue.facebook_link,
+        'seeking_talent': Venue.seeking_talent,
+        'seeking_description': Venue.seeking_description,
+        'num_upcoming_shows': upcoming_shows_count(Venue, Show.venue_id, now),
+        'num_past_shows': past_shows_count(Venue, Show.venue_id, now)
+    }
+
+
+def artist_columns(now):
+    # Artist fields read straight from columns
+    return {
+        'id': Artist.id,
+        'name': Artist.name,
+        'city': Artist.city,
+        'state': Artist.state,
+        'phone': Artist.phone,
+        'image_link': Artist.image_link,
+        'website_link': Artist.website_link,
+        'facebook_link': Artist.facebook_link,
+        'seeking_venue': Artist.seeking_venue,
+        'seeking_description': Artist.seeking_description,
+        'available_times': Artist.available_times,
+        'available_start': Artist.available_start,
+        'available_end': Artist.available_end,
+        'num_upcoming_shows': upcoming_shows_count(Artist, Show.artist_id, now),
+        'num_past_shows': past_shows_count(Artist, Show.artist_id, now)
+    }
+
+
+SHOW_COLUMNS = {
+    'id': Show.id,
+    'start_time': Show.start_time,
+    'venue_id': Show.venue_id,
+    'venue_name': Venue.name,
+    'venue_image_link': Venue.image_link,
+    'artist_id': Show.artist_id,
+    'artist_name': Artist.name,
+    'artist_image_link': Artist.image_link
+}
+
+# Every field a resource offers, and the defaults for listings. Albums are
+# one query per artist, so only the artist detail offers them.
+VENUE_FIELDS = [
+    'id', 'name', 'city', 'state', 'address', 'phone', 'image_link', 'website_link', 'facebook_link',
+    'seeking_talent', 'seeking_description', 'num_upcoming_shows', 'num_past_shows', 'genres'
+]
+VENUE_LIST_FIELDS = ['id', 'name', 'city', 'state', 'num_upcoming_shows']
+ARTIST_LIST_AVAILABLE = [
+    'id', 'name', 'city', 'state', 'phone', 'image_link', 'website_link', 'facebook_link', 'seeking_venue',
+    'seeking_description', 'available_times', 'available_start', 'available_end', 'num_upcoming_shows', 'num_past_shows', 'genres'
+]
+ARTIST_FIELDS = ARTIST_LIST_AVAILABLE + ['albums']
+ARTIST_LIST_FIELDS = ['id', 'name', 'city', 'state', 'num_upcoming_shows']
+SHOW_FIELDS = list(SHOW_COLUMNS)
+
+
+def requested_fields(available, default):
+    # The ?fields= subset of the available fields, or the default ones
+    fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        abort(400, f"Unknown fields: {', '.join(unknown)}.")
+    return fields or default
+
+
+def select_fields(query, columns, fields, keys=()):
+    # Replace the query's entities with the requested columns, plus any
+    # pagination keys, each labeled with its field name
+    selected = {field: columns[field].label(field) for field in fields if field in columns}
+    for key in keys:
+        selected.setdefault(key.key, key.label(key.key))
+    selected.setdefault('id', columns['id'].label('id'))
+    return query.with_entities(*selected.values())
+
+
+def genres_by_id(model, foreign_key, ids):
+    # Genres of each listed row from one query
+    genres = {}
+    for owner_id, genre in db.session.query(foreign_key, model.genre).filter(foreign_key.in_(ids)).order_by(model.genre):
+        genres.setdefault(owner_id, []).append(genre)
+    return genres
+
+
+def serialize(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def to_dicts(rows, fields, extras=None):
+    # Plain dicts of the requested fields; extras maps a field to values by id
+    extras = extras or {}
+    items = []
+    for row in rows:
+        items.append({field: extras[field].get(row.id, []) if field in extras else serialize(getattr(row, field)) for field in fields})
+    return items
+
+
+def venue_extras(rows, fields):
+    if 'genres' in fields:
+        return {'genres': genres_by_id(VenueGenre, VenueGenre.venue_id, [row.id for row in rows])}
+    return {}
+
+
+def artist_extras(rows, fields):
+    extras = {}
+    if 'genres' in fields:
+        extras['genres'] = genres_by_id(ArtistGenre, ArtistGenre.artist_id, [row.id for row in rows])
+    if 'albums' in fields:
+        extras['albums'] = {row.id: artist_albums(row.id) for row in rows}
+    return extras
+
+
+def page_response(page, items):
+    return jsonify({
+        'data': items,
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+        'per_page': page.per_page
+    })
+
+
+def venue_page(query, fields, keys, descending=False):
+    page = paginate(select_fields(query, venue_columns(datetime.utcnow()), fields, keys), keys, request.args.get('cursor'), request.args.get('per_page'), descending=descending)
+    return page_response(page, to_dicts(page.items, fields, venue_extras(page.items, fields)))
+
+
+def artist_page(query, fields, keys, descending=False):
+    page = paginate(select_fields(query, artist_columns(datetime.utcnow()), fields, keys), keys, request.args.get('cursor'), request.args.get('per_page'), descending=descending)
+    return page_response(page, to_dicts(page.items, fields, artist_extras(page.items, fields)))
+
+
+def show_page(criteria, fields, descending=False):
+    query = db.session.query(Show.id).join(Artist, Artist.id == Show.artist_id).join(Venue, Venue.id == Show.venue_id).filter(*criteria)
+    keys = [Show.start_time, Show.id]
+    page = paginate(select_fields(query, SHOW_COLUMNS, fields, keys), keys, request.args.get('cursor'), request.args.get('per_page'), descending=descending)
+    return page_response(page, to_dicts(page.items, fields))
+
+
+def show_criteria(foreign_key=None, owner_id=None):
+    # ?when=upcoming (default) or ?when=past, optionally for one owner
+    now = datetime.utcnow()
+    when = request.args.get('when', 'upcoming')
+    if when not in ('upcoming', 'past'):
+        abort(400, 'when must be upcoming or past.')
+    criteria = [Show.start_time >= now if when == 'upcoming' else Show.start_time < now]
+    if foreign_key is not None:
+        criteria.append(foreign_key == owner_id)
+    return criteria, when == 'past'
+
+
+def location_or_400(term):
+    location = search.parse_location(term)
+    if location is None:
+        abort(400, 'Search by city must be in the form (City, State).')
+    return location
+
+
+@api.errorhandler(400)
+@api.errorhandler(404)
+def api_error(error):
+    # Registered by code so they take precedence over the app's HTML pages
+    return jsonify({'error': error.name, 'message': error.description, 'status': error.code}), error.code
+
+
+#  Export
+#  ----------------------------------------------------------------
+
+
+@api.route('/export/<resource>')
+def export(resource):
+    # Every row of the resource streamed as ?format=csv (default) or ndjson
+    format = request.args.get('format', 'csv')
+    if resource not in EXPORTS:
+        abort(404, f'No export named {resource}.')
+    if format not in FORMATS:
+        abort(400, 'format must be csv or ndjson.')
+    response = Response(stream_with_context(export_batches(resource, format)), mimetype=FORMATS[format])
+    response.headers['Content-Disposition'] = f'attachment; filename={resource}.{format}'
+    return response
+
+
+@api.route('/<path:path>')
+def not_found(path):
+    abort(404, 'No such API endpoint.')
+
+#  Venues
+#  ----------------------------------------------------------------
+
+
+@api.route('/venues')
+@conditional(listing_last_modified)
+def venues():
+    fields = requested_fields(VENUE_FIELDS, VENUE_LIST_FIELDS)
+    return venue_page(db.session.query(Venue.id), fields, [Venue.name, Venue.id])
+
+
+@api.route('/venues/<int:venue_id>')
+@conditional(lambda now, venue_id: venue_last_modified(venue_id, now))
+def venue(venue_id):
+    fields = requested_fields(VENUE_FIELDS, VENUE_FIELDS)
+    row = select_fields(db.session.query(Venue.id), venue_columns(datetime.utcnow()), fields).filter(Venue.id == venue_id).first()
+    if row is None:
+        abort(404, f'No venue found with id {venue_id}.')
+    return jsonify(to_dicts([row], fields, venue_extras([row], fields))[0])
+
+
+@api.route('/venues/<int:venue_id>/shows')
+@conditional(lambda now, venue_id: venue_last_modified(venue_id, now))
+def venue_shows(venue_id):
+    fields = requested_fields(SHOW_FIELDS, SHOW_FIELDS)
+    criteria, descending = show_criteria(Show.venue_id, venue_id)
+    return show_page(criteria, fields, descending)
+
+#  Artists
+#  ----------------------------------------------------------------
+
+
+@api.route('/artists')
+@conditional(listing_last_modified)
+def artists():
+    fields = requested_fields(ARTIST_LIST_AVAILABLE, ARTIST_LIST_FIELDS)
+    return artist_page(db.session.query(Artist.id), fields, [Artist.name, Artist.id])
+
+
+@api.route('/artists/<int:artist_id>')
+@conditional(lambda now, artist_id: artist_last_modified(artist_id, now))
+def artist(artist_id):
+    fields = requested_fields(ARTIST_FIELDS, ARTIST_FIELDS)
+    row = select_fields(db.session.query(Artist.id), artist_columns(datetime.utcnow()), fields).filter(Artist.id == artist_id).first()
+    if row is None:
+        abort(404, f'No artist found with id {artist_id}.')
+    return jsonify(to_dicts([row], fields, artist_extras([row], fields))[0])
+
+
+@api.route('/artists/<int:artist_id>/shows')
+@conditional(lambda now, artist_id: artist_last_modified(artist_id, now))
+def artist_shows(artist_id):
+    fields = requested_fields(SHOW_FIELDS, SHOW_FIELDS)
+    criteria, descending = show_criteria(Show.artist_id, artist_id)
+    return show_page(criteria, fields, descending)
+
+@api.route('/artists/<int:artist_id>/shows', methods=['POST'])
+def schedule_artist_shows(artist_id):
+    # Schedule {"shows": [{"venue_id", "start_time"}]} for the artist in one
+    # transaction. Every show is checked with a fixed number of queries and
+    # either all are created or none, with each rejected row's errors.
+    if db.session.query(Artist.id).filter(Artist.id == artist_id).first() is None:
+        abort(404, f'No artist found with id {artist_id}.')
+    body = request.get_json(silent=True)
+    shows = body.get('shows') if isinstance(body, dict) else None
+    if not isinstance(shows, list) or not shows:
+        abort(400, 'Body must be {"shows": [{"venue_id": ..., "start_time": ...}]}.')
+    if len(shows) > MAX_SCHEDULE_SHOWS:
+        abort(400, f'At most {MAX_SCHEDULE_SHOWS} shows can be scheduled at once.')
+
+    # Parse rows, then check the well formed ones against the database
+    rows, rejected = [], []
+    for number, show in enumerate(shows, 1):
+        try:
+            rows.append((number, {'artist_id': artist_id, 'venue_id': int(show['venue_id']), 'start_time': parse_local_datetime(show['start_time'])}))
+        except (KeyError, TypeError, ValueError):
+            rejected.append((number, {'show': ['Show must have an integer venue_id and an ISO 8601 start_time with no UTC offset.']}))
+    accepted, booking_rejected = check_show_batch(rows)
+    rejected = sorted(rejected + booking_rejected)
+    if rejected:
+        return jsonify({'errors': [{'row': number, 'errors': errors} for number, errors in rejected]}), 422
+
+    try:
+        insert_shows(accepted)
+        db.session.commit()
+    except IntegrityError:
+        # Lost a race for a slot to a concurrent booking
+        db.session.rollback()
+        return jsonify({'error': 'Conflict', 'message': 'A venue or the artist was just booked at one of those times.', 'status': 409}), 409
+    current_app.extensions['page_cache'].invalidate(*{tag for show in accepted for tag in show_tags(show['venue_id'], artist_id)})
+
+    # Read the new shows back by their unique (artist, start_time) slots
+    query = db.session.query(Show.id).join(Artist, Artist.id == Show.artist_id).join(Venue, Venue.id == Show.venue_id) \
+        .filter(Show.artist_id == artist_id, Show.start_time.in_([show['start_time'] for show in accepted])) \
+        .order_by(Show.start_time)
+    rows = select_fields(query, SHOW_COLUMNS, SHOW_FIELDS).all()
+    return jsonify({'data': to_dicts(rows, SHOW_FIELDS)}), 201
+
+#  Shows
+#  ----------------------------------------------------------------
+
+
+@api.route('/shows')
+@conditional(listing_last_modified)
+def shows():
+    fields = requested_fields(SHOW_FIELDS, SHOW_FIELDS)
+    criteria, descending = show_criteria()
+    return show_page(criteria, fields, descending)
+
+#  Search
+#  ----------------------------------------------------------------
+
+
+@api.route('/search/venues')
+def search_venues():
+    # ?q= matches names by rank; with ?city=1 it is a 'City, ST' location
+    fields = requested_fields(VENUE_FIELDS, VENUE_LIST_FIELDS)
+    term = request.args.get('q', '')
+    if request.args.get('city'):
+        return venue_page(search.search_venues_in(location_or_400(term)), fields, [Venue.name, Venue.id])
+    venues, rank = search.search_venues(term)
+    return venue_page(venues, fields, [rank, Venue.id], descending=True)
+
+
+@api.route('/search/artists')
+def search_artists():
+    # ?q= matches names by rank; with ?city=1 it is a 'City, ST' location
+    fields = requested_fields(ARTIST_LIST_AVAILABLE, ARTIST_LIST_FIELDS)
+    term = request.args.get('q', '')
+    if request.args.get('city'):
+        return artist_page(search.search_artists_in(location_or_400(term)), fields, [Artist.name, Artist.id])
+    artists, rank = search.search_artists(term)
+    return artist_page(artists, fields, [rank, Artist.id], descending=True)
+
+
+@api.route('/search/shows')
+def search_shows():
+    # Shows whose artist or venue matches ?q=, or is in it with ?city=1
+    fields = requested_fields(SHOW_FIELDS, SHOW_FIELDS)
+    term = request.args.get('q', '')
+    if request.args.get('city'):
+        return show_page([search.shows_in(location_or_400(term))], fields)
+    return show_page([search.shows_matching(term)], fields)
@@ -1,100 +1,96 @@
-import json
 import dateutil.parser
 import babel
-import re
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+from functools import lru_cache
+from itertools import groupby
+from flask import Flask, render_template, request, flash, redirect, url_for, jsonify, abort
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import distinct, func, or_, and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
 from flask_migrate import Migrate
 import logging
 from logging import Formatter, FileHandler
-from flask_wtf import Form
 from flask_wtf.csrf import CSRFProtect
 from forms import *
+from models import db, Venue, Artist, Show, VenueGenre, ArtistGenre, Album, Song
+from queries import venue_listing, artist_listing, show_listing, show_counts, owner_show_counts, show_booking, check_show_batch, insert_shows, artist_albums, home_feed, paginate, listing_last_modified, venue_last_modified, artist_last_modified, venue_tags, artist_tags, show_tags
+import search
+from cache import PageCache, conditional
+from replicas import ReplicaRouter
+from concurrency import QueryExecutor
+from telemetry import Telemetry, stats_authorized
+from api import api
+from commands import cli
+from config import load_config
 
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
 app = Flask(__name__)
-app.config.from_object('config')
+app.config.from_object(load_config())
 
-db = SQLAlchemy(app)
+# First, so its timing wraps every other extension's request handlers
+telemetry = Telemetry(app)
+db.init_app(app)
+replica_router = ReplicaRouter(app)
 moment = Moment(app)
-migrate = Migrate(app, db)
+migrate = Migrate(app, db, include_object=search.include_object)
 csrf = CSRFProtect(app)
+page_cache = PageCache(app)
+query_executor = QueryExecutor(app)
+app.register_blueprint(api)
+# JSON clients post without a CSRF token
+csrf.exempt(api)
+app.cli.add_command(cli)
 
 #----------------------------------------------------------------------------#
-# Models.
+# Filters.
 #----------------------------------------------------------------------------#
 
 
-class Venue(db.Model):
-    __tablename__ = 'venues'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String, nullable=False)
-    city = db.Column(db.String(120), nullable=False)
-    state = db.Column(db.String(120), nullable=False)
-    address = db.Column(db.String(120), nullable=True)
-    phone = db.Column(db.String(120), nullable=True)
-    genres = db.Column(db.String(500), nullable=False)
-    image_link = db.Column(db.String(500), nullable=False)
-    website_link = db.Column(db.String(120), nullable=True)
-    facebook_link = db.Column(db.String(120), nullable=True)
-    seeking_talent = db.Column(db.Boolean(), nullable=False)
-    seeking_description = db.Column(db.String(), nullable=True)
-    created_date = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow)
-    shows = db.relationship('Show', backref='venue', lazy=True, cascade='delete')
-    
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma"
+}
 
-class Artist(db.Model):
-    __tablename__ = 'artists'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String, nullable=False)
-    city = db.Column(db.String(120), nullable=False)
-    state = db.Column(db.String(120), nullable=False)
-    phone = db.Column(db.String(120), nullable=True)
-    genres = db.Column(db.String(500), nullable=False)
-    image_link = db.Column(db.String(500), nullable=False)
-    website_link = db.Column(db.String(120), nullable=True)
-    facebook_link = db.Column(db.String(120), nullable=True)
-    albums = db.Column(db.String(500), nullable=True)
-    seeking_venue = db.Column(db.Boolean(), nullable=False)
-    seeking_description = db.Column(db.String(), nullable=True)
-    available_times = db.Column(db.Boolean(), nullable=False)
-    available_start = db.Column(db.DateTime(), nullable=True)
-    available_end = db.Column(db.DateTime(), nullable=True)
-    created_date = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow)
-    shows = db.relationship('Show', backref='artist', lazy=True, cascade='delete')
-
-
-class Show(db.Model):
-    __tablename__ = 'shows'
-    id = db.Column(db.Integer, primary_key=True)
-    artist_id = db.Column(db.ForeignKey('artists.id'), nullable=False)
-    venue_id = db.Column(db.ForeignKey('venues.id'), nullable=False)
-    start_time = db.Column(db.DateTime(), nullable=False)
-    created_date = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow)
 
-#----------------------------------------------------------------------------#
-# Filters.
-#----------------------------------------------------------------------------#
+@lru_cache(maxsize=None)
+def datetime_pattern(format, locale):
+    # Parsed Babel pattern and locale, built once per (format, locale)
+    return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format)), babel.Locale.parse(locale)
 
 
-def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format)
+def format_datetime(value, format='medium', locale=None):
+    # Strings are still accepted, but views pass datetimes to skip parsing
+    if isinstance(value, str):
+        value = dateutil.parser.parse(value)
+    pattern, locale = datetime_pattern(format, locale or babel.dates.LC_TIME)
+    return pattern.apply(value, locale)
 
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+#----------------------------------------------------------------------------#
+# Show booking.
+#----------------------------------------------------------------------------#
+
+
+def check_booking(form, show_id=None):
+    # Set form errors for a missing artist or venue, an unavailable artist
+    # or a double booking, checked in one query
+    booking = show_booking(form.artist_id.data, form.venue_id.data, form.start_time.data, show_id)
+    if not booking.artist_exists:
+        form.artist_id.errors.append(f'No artist found with id {form.artist_id.data}.')
+    elif not booking.artist_available:
+        form.start_time.errors.append("Artist isn't avaliable at that time.")
+    elif booking.artist_booked:
+        form.start_time.errors.append('Artist is already booked at that time.')
+    if not booking.venue_exists:
+        form.venue_id.errors.append(f'No venue found with id {form.venue_id.data}.')
+    elif booking.venue_booked:
+        form.start_time.errors.append('Venue is already booked at that time.')
+    return not form.errors
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
@@ -104,156 +100,136 @@ app.jinja_env.filters['datetime'] = format_datetime
 def index():
     now = datetime.utcnow()
 
-    # Get recent venues
-    venues = []
-    for venue in db.session.query(Venue).order_by(Venue.created_date.desc()).limit(10).all():
-        # Calculate upcoming shows count
-        upcoming_shows = 0
-        for show in venue.shows:
-            if show.start_time > now:
-                upcoming_shows = upcoming_shows + 1
-
-        # Append venue to venues
-        venues.append({
-            'id': venue.id,
-            'name': venue.name,
-            'num_upcoming_shows': upcoming_shows
-        })
+    # Get precomputed recent venues, recent artists and trending venues
+    # with one primary key read
+    feed = home_feed(now)
 
-    # Get recent artists
-    artists = []
-    for artist in db.session.query(Artist).order_by(Artist.created_date.desc()).limit(10).all():
-        # Calculate upcoming shows count
-        upcoming_shows = 0
-        for show in artist.shows:
-            if show.start_time > now:
-                upcoming_shows = upcoming_shows + 1
-
-        # Append artist to artists
-        artists.append({
-            'id': artist.id,
-            'name': artist.name,
-            'num_upcoming_shows': upcoming_shows
-        })
-    
-    return render_template('pages/home.html', artists=artists, venues=venues)
+    return render_template('pages/home.html', artists=feed['artists'], venues=feed['venues'], trending_venues=feed['trending_venues'])
 
 
 #  Venues
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@conditional(listing_last_modified)
+@page_cache.cached('venues')
 def venues():
     areas = []
+    now = datetime.utcnow()
 
-    # Get areas
-    for area in db.session.query(Venue.city, Venue.state).distinct().order_by(Venue.city, Venue.state).all():
-        venues = []
-        now = datetime.utcnow()
-
-        # Get venues in area
-        for venue in db.session.query(Venue).filter(Venue.city == area.city, Venue.state == area.state).order_by(Venue.name).all():
-            # Calculate upcoming shows count
-            upcoming_shows = 0
-            for show in venue.shows:
-                if show.start_time > now:
-                    upcoming_shows = upcoming_shows + 1
-
-            # Append venue to area.venues
-            venues.append({
-                'id': venue.id,
-                'name': venue.name,
-                'num_upcoming_shows': upcoming_shows
-            })
+    # Get page of venues ordered by area
+    page = paginate(venue_listing(now), [Venue.city, Venue.state, Venue.name, Venue.id], request.args.get('cursor'), request.args.get('per_page'))
 
+    # Group venues into areas in one pass
+    for (city, state), venues in groupby(page.items, key=lambda venue: (venue.city, venue.state)):
         # Append area to areas
         areas.append({
-            'city': area.city,
-            'state': area.state,
-            'venues': venues
+            'city': city,
+            'state': state,
+            'venues': list(venues)
         })
 
     # Render venues
-    return render_template('pages/venues.html', areas=areas)
+    return render_template('pages/venues.html', areas=areas, page=page)
 
 
-@app.route('/venues/search', methods=['POST'])
+@app.route('/venues/search', methods=['GET', 'POST'])
 @csrf.exempt
 def search_venues():
-    venues = []
     now = datetime.utcnow()
 
     # Search venues
-    term = request.form.get('search_term', '')
-    by_city = request.form.get('search_city', False)
+    term = request.values.get('search_term', '')
+    by_city = request.values.get('search_city', False)
     if not by_city:
-        for venue in db.session.query(Venue).filter(Venue.name.ilike(f'%{term}%')).order_by(Venue.name).all():
-            # Calculate upcoming shows count
-            upcoming_shows = 0
-            for show in venue.shows:
-                if show.start_time > now:
-                    upcoming_shows = upcoming_shows + 1
-
-            # Add venue to venues
-            venues.append({
-                'id': venue.id,
-                'name': venue.name,
-                'num_upcoming_shows': upcoming_shows
-            })
+        venues, rank = search.search_venues(term, now)
+        keys = [rank, Venue.id]
     else:
-        city = term.split(', ')[0]
-        state = term.split(', ')[1]
-        for venue in db.session.query(Venue).filter(and_(Venue.city.ilike(f'%{city}%'), Venue.state.ilike(f'%{state}%'))).order_by(Venue.name).all():
-            # Calculate upcoming shows count
-            upcoming_shows = 0
-            for show in venue.shows:
-                if show.start_time > now:
-                    upcoming_shows = upcoming_shows + 1
-
-            # Add venue to venues
-            venues.append({
-                'id': venue.id,
-                'name': venue.name,
-                'num_upcoming_shows': upcoming_shows
-            })
+        location = search.parse_location(term)
+        if location is None:
+            flash('Search by city must be in the form (City, State).')
+        venues = search.search_venues_in(location, now)
+        keys = [Venue.name, Venue.id]
+
+    # Get page of venues
+    page = paginate(venues, keys, request.values.get('cursor'), request.values.get('per_page'), descending=not by_city)
 
     # Render venues
-    return render_template('pages/search_venues.html', results={'count': len(venues), 'data': venues}, search_term=term)
+    return render_template('pages/search_venues.html', results={'count': venues.count(), 'data': page.items}, page=page, search_term=term, search_city=by_city or None)
+
+
+@app.route('/venues/genres/<genre>')
+@conditional(lambda now, genre: listing_last_modified(now))
+def venues_by_genre(genre):
+    now = datetime.utcnow()
+
+    # Check if genre exists
+    if genre not in Genre.__members__:
+        return render_template('errors/404.html'), 404
+
+    # Get venues with genre through the genre index
+    venues = venue_listing(now).join(VenueGenre, VenueGenre.venue_id == Venue.id).filter(VenueGenre.genre == genre)
+
+    # Filter by state and seeking talent
+    state = request.args.get('state') or None
+    if state:
+        venues = venues.filter(Venue.state == state)
+    seeking_talent = request.args.get('seeking_talent') or None
+    if seeking_talent:
+        venues = venues.filter(Venue.seeking_talent == True)
+
+    # Get page of venues
+    page = paginate(venues, [Venue.name, Venue.id], request.args.get('cursor'), request.args.get('per_page'))
+
+    # Render venues
+    return render_template('pages/genre_venues.html', venues=page.items, page=page, genre=Genre[genre], state=state, seeking_talent=seeking_talent)
 
 
 @app.route('/venues/<int:venue_id>')
+@conditional(lambda now, venue_id: venue_last_modified(venue_id, now))
+@page_cache.cached('venue:{venue_id}')
 def show_venue(venue_id):
     now = datetime.utcnow()
-
-    # Get venue
-    venue = db.session.query(Venue).filter(Venue.id == venue_id).first()
+    upcoming_cursor = request.args.get('upcoming_cursor')
+    past_cursor = request.args.get('past_cursor')
+    per_page = request.args.get('per_page')
+
+    # Get venue, its pages of upcoming and past shows and its show counts
+    # at the same time
+    venue, upcoming_page, past_page, counts = query_executor.run(
+        lambda: db.session.query(Venue).options(selectinload(Venue.genre_rows)).filter(Venue.id == venue_id).first(),
+        lambda: paginate(show_listing().filter(Show.venue_id == venue_id, Show.start_time >= now), [Show.start_time, Show.id], upcoming_cursor, per_page),
+        lambda: paginate(show_listing().filter(Show.venue_id == venue_id, Show.start_time < now), [Show.start_time, Show.id], past_cursor, per_page, descending=True),
+        lambda: owner_show_counts(Venue, Show.venue_id, venue_id, now)
+    )
 
     # Check if venue exists
     if venue:
-        # Get upcoming and past shows
-        past_shows = []
+        # Upcoming shows, soonest first
         upcoming_shows = []
-        for show in venue.shows:
-            if show.start_time < now:
-                past_shows.append({
-                    'artist_id': show.artist.id,
-                    'artist_name': show.artist.name,
-                    'artist_image_link': show.artist.image_link,
-                    'start_time': show.start_time.strftime("%Y-%m-%dT%H:%M")
-                })
-            else:
-                upcoming_shows.append({
-                    'artist_id': show.artist.id,
-                    'artist_name': show.artist.name,
-                    'artist_image_link': show.artist.image_link,
-                    'start_time': show.start_time.strftime("%Y-%m-%dT%H:%M")
-                })
+        for show in upcoming_page.items:
+            upcoming_shows.append({
+                'artist_id': show.artist.id,
+                'artist_name': show.artist.name,
+                'artist_image_link': show.artist.image_link,
+                'start_time': show.start_time
+            })
+
+        # Past shows, most recent first
+        past_shows = []
+        for show in past_page.items:
+            past_shows.append({
+                'artist_id': show.artist.id,
+                'artist_name': show.artist.name,
+                'artist_image_link': show.artist.image_link,
+                'start_time': show.start_time
+            })
 
         # Render venue
         return render_template('pages/show_venue.html', venue={
             'id': venue.id,
             'name': venue.name,
-            'genres': map(lambda genre: Genre[genre].value, venue.genres.split(',')[:-1]),
+            'genres': [Genre[genre] for genre in venue.genres],
             'address': venue.address,
             'city': venue.city,
             'state': venue.state,
@@ -263,11 +239,11 @@ def show_venue(venue_id):
             'facebook_link': venue.facebook_link,
             'seeking_talent': venue.seeking_talent,
             'seeking_description': venue.seeking_description if venue.seeking_talent == True else None,
-            'past_shows': past_shows[::-1],
+            'past_shows': past_shows,
             'upcoming_shows': upcoming_shows,
-            'past_shows_count': len(past_shows),
-            'upcoming_shows_count': len(upcoming_shows)
-        })
+            'past_shows_count': counts.past,
+            'upcoming_shows_count': counts.upcoming
+        }, upcoming_page=upcoming_page, past_page=past_page)
     else:
         # Venue was not found
         return render_template('errors/404.html'), 404
@@ -290,43 +266,27 @@ def create_venue_submission():
     # Get venue form
     form = VenueForm(request.form)
 
-    # Validate venue form
-    valid = form.validate()
-    if form.phone.data.strip() != '' and not re.match(r'^[0-9]{3}-[0-9]{3}-[0-9]{4}$', form.phone.data.strip()):
-        form.phone.errors = ['Phone must be in the form (xxx-xxx-xxxx).']
-        valid = False
-
-    if form.website_link.data.strip() != '' and not re.match(r"^[a-z]+://(?P<host>[^\/\?:]+)(?P<port>:[0-9]+)?(?P<path>\/.*?)?(?P<query>\?.*)?$", form.website_link.data.strip()):
-        form.website_link.errors = ['Website link must be an URL.']
-        valid = False
-
-    if form.facebook_link.data.strip() != '' and not re.match(r"^[a-z]+://(?P<host>[^\/\?:]+)(?P<port>:[0-9]+)?(?P<path>\/.*?)?(?P<query>\?.*)?$", form.facebook_link.data.strip()):
-        form.facebook_link.errors = ['Website link must be an URL.']
-        valid = False
-
     # Check if venue form is valid
-    if valid:
+    if form.validate():
         # Create venue
         venue = Venue()
-        venue.name = form.name.data.strip()
-        genres = ''
-        for genre in form.genres.data:
-            genres = genres + genre + ','
-        venue.genres = genres
-        venue.address = form.address.data.strip() if form.address.data.strip() != '' else None
-        venue.city = form.city.data.strip()
+        venue.name = form.name.data
+        venue.genres = form.genres.data
+        venue.address = form.address.data or None
+        venue.city = form.city.data
         venue.state = form.state.data
-        venue.phone = form.phone.data.strip() if form.phone.data.strip() != '' else None
-        venue.image_link = form.image_link.data.strip()
-        venue.website_link = form.website_link.data.strip() if form.website_link.data.strip() != '' else None
-        venue.facebook_link = form.facebook_link.data.strip() if form.facebook_link.data.strip() != '' else None
+        venue.phone = form.phone.data or None
+        venue.image_link = form.image_link.data
+        venue.website_link = form.website_link.data or None
+        venue.facebook_link = form.facebook_link.data or None
         venue.seeking_talent = form.seeking_talent.data
-        venue.seeking_description = form.seeking_description.data.strip() if form.seeking_talent.data == True else None
+        venue.seeking_description = form.seeking_description.data if form.seeking_talent.data == True else None
 
         # Add venue
         try:
             db.session.add(venue)
             db.session.commit()
+            page_cache.invalidate('venues')
             flash(f'Venue {venue.name} was successfully listed!')
         except:
             db.session.rollback()
@@ -351,7 +311,7 @@ def edit_venue(venue_id):
         # Create venue form from existing venue
         form = VenueForm()
         form.name.data = venue.name
-        form.genres.data = venue.genres.split(',')[:-1]
+        form.genres.data = list(venue.genres)
         form.address.data = venue.address if venue.address else ''
         form.city.data = venue.city
         form.state.data = venue.state
@@ -379,41 +339,29 @@ def edit_venue_submission(venue_id):
         # Get venue form
         form = VenueForm(request.form)
 
-        # Validate venue form
-        valid = form.validate()
-        if form.phone.data.strip() != '' and not re.match(r'^[0-9]{3}-[0-9]{3}-[0-9]{4}$', form.phone.data.strip()):
-            form.phone.errors = ['Phone must be in the form (xxx-xxx-xxxx).']
-            valid = False
-
-        if form.website_link.data.strip() != '' and not re.match(r"^[a-z]+://(?P<host>[^\/\?:]+)(?P<port>:[0-9]+)?(?P<path>\/.*?)?(?P<query>\?.*)?$", form.website_link.data.strip()):
-            form.website_link.errors = ['Website link must be an URL.']
-            valid = False
-
-        if form.facebook_link.data.strip() != '' and not re.match(r"^[a-z]+://(?P<host>[^\/\?:]+)(?P<port>:[0-9]+)?(?P<path>\/.*?)?(?P<query>\?.*)?$", form.facebook_link.data.strip()):
-            form.facebook_link.errors = ['Website link must be an URL.']
-            valid = False
-
         # Check if venue form is valid
-        if valid:
+        if form.validate():
             # Edit venue
-            venue.name = form.name.data.strip()
-            genres = ''
-            for genre in form.genres.data:
-                genres = genres + genre + ','
-            venue.genres = genres
-            venue.address = form.address.data.strip() if form.address.data.strip() != '' else None
-            venue.city = form.city.data.strip()
+            venue.name = form.name.data
+            venue.genres = form.genres.data
+            venue.address = form.address.data or None
+            venue.city = form.city.data
             venue.state = form.state.data
-            venue.phone = form.phone.data.strip() if form.phone.data.strip() != '' else None
-            venue.image_link = form.image_link.data.strip()
-            venue.website_link = form.website_link.data.strip() if form.website_link.data.strip() != '' else None
-            venue.facebook_link = form.facebook_link.data.strip() if form.facebook_link.data.strip() != '' else None
+            venue.phone = form.phone.data or None
+            venue.image_link = form.image_link.data
+            venue.website_link = form.website_link.data or None
+            venue.facebook_link = form.facebook_link.data or None
             venue.seeking_talent = form.seeking_talent.data
-            venue.seeking_description = form.seeking_description.data.strip() if form.seeking_talent.data == True else None
+            venue.seeking_description = form.seeking_description.data if form.seeking_talent.data == True else None
+
+            # Genre changes alone leave the venue row untouched
+            venue.updated_at = datetime.utcnow()
 
             # Update venue
             try:
+                tags = venue_tags(venue_id)
                 db.session.commit()
+                page_cache.invalidate(*tags)
                 flash(f'Venue {venue.name} was successfully edited!')
             except:
                 db.session.rollback()
@@ -441,8 +389,10 @@ def delete_venue(venue_id):
     if venue:
         # Delete venue
         try:
+            tags = venue_tags(venue_id)
             db.session.delete(venue)
             db.session.commit()
+            page_cache.invalidate(*tags)
             flash(f'Venue {venue.name} was successfully deleted!')
         except:
             db.session.rollback()
@@ -462,122 +412,116 @@ def delete_venue(venue_id):
 
 
 @app.route('/artists')
+@conditional(listing_last_modified)
+@page_cache.cached('artists')
 def artists():
-    artists = []
     now = datetime.utcnow()
 
-    # Get artists
-    for artist in db.session.query(Artist).order_by(Artist.name).all():
-        # Calculate upcoming shows count
-        upcoming_shows = 0
-        for show in artist.shows:
-            if show.start_time > now:
-                upcoming_shows = upcoming_shows + 1
-
-        # Append artist to artists
-        artists.append({
-            'id': artist.id,
-            'name': artist.name,
-            'num_upcoming_shows': upcoming_shows
-        })
+    # Get page of artists
+    page = paginate(artist_listing(now), [Artist.name, Artist.id], request.args.get('cursor'), request.args.get('per_page'))
 
     # Render artists
-    return render_template('pages/artists.html', artists=artists)
+    return render_template('pages/artists.html', artists=page.items, page=page)
 
 
-@app.route('/artists/search', methods=['POST'])
+@app.route('/artists/search', methods=['GET', 'POST'])
 @csrf.exempt
 def search_artists():
-    artists = []
     now = datetime.utcnow()
 
     # Search artists
-    term = request.form.get('search_term', '')
-    by_city = request.form.get('search_city', False)
+    term = request.values.get('search_term', '')
+    by_city = request.values.get('search_city', False)
     if not by_city:
-        for artist in db.session.query(Artist).filter(Artist.name.ilike(f'%{term}%')).order_by(Artist.name).all():
-            # Calculate upcoming shows count
-            upcoming_shows = 0
-            for show in artist.shows:
-                if show.start_time > now:
-                    upcoming_shows = upcoming_shows + 1
-
-            # Add artist to artists
-            artists.append({
-                'id': artist.id,
-                'name': artist.name,
-                'num_upcoming_shows': upcoming_shows
-            })
+        artists, rank = search.search_artists(term, now)
+        keys = [rank, Artist.id]
     else:
-        city = term.split(', ')[0]
-        state = term.split(', ')[1]
-        for artist in db.session.query(Artist).filter(and_(Artist.city.ilike(f'%{city}%'), Artist.state.ilike(f'%{state}%'))).order_by(Artist.name).all():
-            # Calculate upcoming shows count
-            upcoming_shows = 0
-            for show in artist.shows:
-                if show.start_time > now:
-                    upcoming_shows = upcoming_shows + 1
-
-            # Add artist to artists
-            artists.append({
-                'id': artist.id,
-                'name': artist.name,
-                'num_upcoming_shows': upcoming_shows
-            })
-    
+        location = search.parse_location(term)
+        if location is None:
+            flash('Search by city must be in the form (City, State).')
+        artists = search.search_artists_in(location, now)
+        keys = [Artist.name, Artist.id]
+
+    # Get page of artists
+    page = paginate(artists, keys, request.values.get('cursor'), request.values.get('per_page'), descending=not by_city)
+
     # Render artists
-    return render_template('pages/search_artists.html', results={'count': len(artists), 'data': artists}, search_term=term)
+    return render_template('pages/search_artists.html', results={'count': artists.count(), 'data': page.items}, page=page, search_term=term, search_city=by_city or None)
+
+
+@app.route('/artists/genres/<genre>')
+@conditional(lambda now, genre: listing_last_modified(now))
+def artists_by_genre(genre):
+    now = datetime.utcnow()
+
+    # Check if genre exists
+    if genre not in Genre.__members__:
+        return render_template('errors/404.html'), 404
+
+    # Get artists with genre through the genre index
+    artists = artist_listing(now).join(ArtistGenre, ArtistGenre.artist_id == Artist.id).filter(ArtistGenre.genre == genre)
+
+    # Filter by state and seeking venue
+    state = request.args.get('state') or None
+    if state:
+        artists = artists.filter(Artist.state == state)
+    seeking_venue = request.args.get('seeking_venue') or None
+    if seeking_venue:
+        artists = artists.filter(Artist.seeking_venue == True)
+
+    # Get page of artists
+    page = paginate(artists, [Artist.name, Artist.id], request.args.get('cursor'), request.args.get('per_page'))
+
+    # Render artists
+    return render_template('pages/genre_artists.html', artists=page.items, page=page, genre=Genre[genre], state=state, seeking_venue=seeking_venue)
 
 
 @app.route('/artists/<int:artist_id>')
+@conditional(lambda now, artist_id: artist_last_modified(artist_id, now))
+@page_cache.cached('artist:{artist_id}')
 def show_artist(artist_id):
     now = datetime.utcnow()
-
-    # Get artist
-    artist = db.session.query(Artist).filter(Artist.id == artist_id).first()
+    upcoming_cursor = request.args.get('upcoming_cursor')
+    past_cursor = request.args.get('past_cursor')
+    per_page = request.args.get('per_page')
+
+    # Get artist, its pages of upcoming and past shows, its show counts
+    # and its albums at the same time
+    artist, upcoming_page, past_page, counts, albums = query_executor.run(
+        lambda: db.session.query(Artist).options(selectinload(Artist.genre_rows)).filter(Artist.id == artist_id).first(),
+        lambda: paginate(show_listing().filter(Show.artist_id == artist_id, Show.start_time >= now), [Show.start_time, Show.id], upcoming_cursor, per_page),
+        lambda: paginate(show_listing().filter(Show.artist_id == artist_id, Show.start_time < now), [Show.start_time, Show.id], past_cursor, per_page, descending=True),
+        lambda: owner_show_counts(Artist, Show.artist_id, artist_id, now),
+        lambda: artist_albums(artist_id)
+    )
 
     # Check if artist exists
     if artist:
-        # Get upcoming and past shows
-        past_shows = []
+        # Upcoming shows, soonest first
         upcoming_shows = []
-        for show in artist.shows:
-            if show.start_time < now:
-                past_shows.append({
-                    'venue_id': show.venue.id,
-                    'venue_name': show.venue.name,
-                    'venue_image_link': show.venue.image_link,
-                    'start_time': show.start_time.strftime("%Y-%m-%dT%H:%M")
-                })
-            else:
-                upcoming_shows.append({
-                    'venue_id': show.venue.id,
-                    'venue_name': show.venue.name,
-                    'venue_image_link': show.venue.image_link,
-                    'start_time': show.start_time.strftime("%Y-%m-%dT%H:%M")
-                })
-
-        # Get albums
-        albums = []
-        if artist.albums:
-            for album in artist.albums.split('),')[:-1]:
-                # Get songs
-                songs = []
-                for song in album.split('(')[1].split(',')[:-1]:
-                    songs.append(song)
-                
-                # Add album to albums
-                albums.append({
-                    'name': album.split('(')[0],
-                    'songs': songs,
-                    'songs_count': len(songs)
-                })
+        for show in upcoming_page.items:
+            upcoming_shows.append({
+                'venue_id': show.venue.id,
+                'venue_name': show.venue.name,
+                'venue_image_link': show.venue.image_link,
+                'start_time': show.start_time
+            })
+
+        # Past shows, most recent first
+        past_shows = []
+        for show in past_page.items:
+            past_shows.append({
+                'venue_id': show.venue.id,
+                'venue_name': show.venue.name,
+                'venue_image_link': show.venue.image_link,
+                'start_time': show.start_time
+            })
 
         # Render artist
         return render_template('pages/show_artist.html', artist={
             'id': artist.id,
             'name': artist.name,
-            'genres': map(lambda genre: Genre[genre].value, artist.genres.split(',')[:-1]),
+            'genres': [Genre[genre] for genre in artist.genres],
             'city': artist.city,
             'state': artist.state,
             'phone': artist.phone,
@@ -587,15 +531,15 @@ def show_artist(artist_id):
             'seeking_venue': artist.seeking_venue,
             'seeking_description': artist.seeking_description if artist.seeking_venue == True else None,
             'available_times': artist.available_times,
-            'available_start': artist.available_start.strftime("%Y-%m-%dT%H:%M") if artist.available_times == True else None,
-            'available_end': artist.available_end.strftime("%Y-%m-%dT%H:%M") if artist.available_times == True else None,
+            'available_start': artist.available_start if artist.available_times == True else None,
+            'available_end': artist.available_end if artist.available_times == True else None,
             'albums': albums,
             'albums_count': len(albums),
-            'past_shows': past_shows[::-1],
+            'past_shows': past_shows,
             'upcoming_shows': upcoming_shows,
-            'past_shows_count': len(past_shows),
-            'upcoming_shows_count': len(upcoming_shows)
-        })
+            'past_shows_count': counts.past,
+            'upcoming_shows_count': counts.upcoming
+        }, upcoming_page=upcoming_page, past_page=past_page)
     else:
         # Artist was not found
         return render_template('errors/404.html'), 404
@@ -618,66 +562,34 @@ def create_artist_submission():
     # Get artist form
     form = ArtistForm(request.form)
 
-    # Validate artist form
-    valid = form.validate()
-    if form.phone.data.strip() != '' and not re.match(r'^[0-9]{3}-[0-9]{3}-[0-9]{4}$', form.phone.data.strip()):
-        form.phone.errors = ['Phone must be in the form (xxx-xxx-xxxx).']
-        valid = False
-
-    if form.website_link.data.strip() != '' and not re.match(r"^[a-z]+://(?P<host>[^\/\?:]+)(?P<port>:[0-9]+)?(?P<path>\/.*?)?(?P<query>\?.*)?$", form.website_link.data.strip()):
-        form.website_link.errors = ['Website link must be an URL.']
-        valid = False
-
-    if form.facebook_link.data.strip() != '' and not re.match(r"^[a-z]+://(?P<host>[^\/\?:]+)(?P<port>:[0-9]+)?(?P<path>\/.*?)?(?P<query>\?.*)?$", form.facebook_link.data.strip()):
-        form.facebook_link.errors = ['Website link must be an URL.']
-        valid = False
-
-    if form.albums.data.strip() != '' and not re.match(r"^([a-z|A-Z|0-9|.| ]+\(([a-z|A-Z|0-9|.|'| ]+,)*\),)+$", form.albums.data.strip().replace(')', ',)') + ','):
-        form.albums.errors = ['Albmus must be in the form [Album1(Song1,Song2),Album2(Song1)].']
-        valid = False
-
-    if form.available_times.data == True and form.available_start.data > form.available_end.data:
-        form.available_start.errors = ['Start time must be before end time.']
-        valid = False
-
     # Check if artist form is valid
-    if valid:
+    if form.validate():
         # Create artist
         artist = Artist()
-        artist.name = form.name.data.strip()
-        genres = ''
-        for genre in form.genres.data:
-            genres = genres + genre + ','
-        artist.genres = genres
-        artist.city = form.city.data.strip()
+        artist.name = form.name.data
+        artist.genres = form.genres.data
+        artist.city = form.city.data
         artist.state = form.state.data
-        artist.phone = form.phone.data.strip() if form.phone.data.strip() != '' else None
-        artist.image_link = form.image_link.data.strip()
-        artist.website_link = form.website_link.data.strip() if form.website_link.data.strip() != '' else None
-        artist.facebook_link = form.facebook_link.data.strip() if form.facebook_link.data.strip() != '' else None
+        artist.phone = form.phone.data or None
+        artist.image_link = form.image_link.data
+        artist.website_link = form.website_link.data or None
+        artist.facebook_link = form.facebook_link.data or None
         artist.seeking_venue = form.seeking_venue.data
-        artist.seeking_description = form.seeking_description.data.strip() if form.seeking_venue.data == True else None
+        artist.seeking_description = form.seeking_description.data if form.seeking_venue.data == True else None
         artist.available_times = form.available_times.data
         artist.available_start = form.available_start.data if form.available_times.data == True else None
         artist.available_end = form.available_end.data if form.available_times.data == True else None
 
-        # Strip albums
-        if form.albums.data.strip() != '':
-            albums = ''
-            albums_str = form.albums.data.strip().replace(')', ',)') + ','
-            for album in albums_str.split('),')[:-1]:
-                songs = ''
-                for song in album.split('(')[1].split(',')[:-1]:
-                    songs = songs + song.strip() + ','
-                albums = albums + album.split('(')[0].strip() + f'({songs}),'
-            artist.albums = albums
-        else:
-            artist.albums = None
+        # Set albums
+        artist.albums = []
+        for position, (name, songs) in enumerate(parse_albums(form.albums.data)):
+            artist.albums.append(Album(name=name, position=position, songs=[Song(name=song, position=i) for i, song in enumerate(songs)]))
 
         # Add artist
         try:
             db.session.add(artist)
             db.session.commit()
+            page_cache.invalidate('artists')
             flash(f'Artist {artist.name} was successfully listed!')
         except:
             db.session.rollback()
@@ -702,14 +614,14 @@ def edit_artist(artist_id):
         # Create artist form from existing artist
         form = ArtistForm()
         form.name.data = artist.name
-        form.genres.data = artist.genres.split(',')[:-1]
+        form.genres.data = list(artist.genres)
         form.city.data = artist.city
         form.state.data = artist.state
         form.phone.data = artist.phone if artist.phone else ''
         form.image_link.data = artist.image_link
         form.website_link.data = artist.website_link if artist.website_link else ''
         form.facebook_link.data = artist.facebook_link if artist.facebook_link else ''
-        form.albums.data = artist.albums.replace(',)', ')')[:-1] if artist.albums else ''
+        form.albums.data = format_albums(artist_albums(artist.id))
         form.seeking_venue.data = artist.seeking_venue
         form.seeking_description.data = artist.seeking_description if artist.seeking_venue == True else "I'm looking for venues."
         form.available_times.data = artist.available_times
@@ -733,64 +645,36 @@ def edit_artist_submission(artist_id):
         # Get artist form
         form = ArtistForm(request.form)
 
-        # Validate artist form
-        valid = form.validate()
-        if form.phone.data.strip() != '' and not re.match(r'^[0-9]{3}-[0-9]{3}-[0-9]{4}$', form.phone.data.strip()):
-            form.phone.errors = ['Phone must be in the form (xxx-xxx-xxxx).']
-            valid = False
-
-        if form.website_link.data.strip() != '' and not re.match(r"^[a-z]+://(?P<host>[^\/\?:]+)(?P<port>:[0-9]+)?(?P<path>\/.*?)?(?P<query>\?.*)?$", form.website_link.data.strip()):
-            form.website_link.errors = ['Website link must be an URL.']
-            valid = False
-
-        if form.facebook_link.data.strip() != '' and not re.match(r"^[a-z]+://(?P<host>[^\/\?:]+)(?P<port>:[0-9]+)?(?P<path>\/.*?)?(?P<query>\?.*)?$", form.facebook_link.data.strip()):
-            form.facebook_link.errors = ['Website link must be an URL.']
-            valid = False
-
-        if form.albums.data.strip() != '' and not re.match(r"^([a-z|A-Z|0-9|.| ]+\(([a-z|A-Z|0-9|.|'| ]+,)*\),)+$", form.albums.data.strip().replace(')', ',)') + ','):
-            form.albums.errors = ['Albmus must be in the form [Album1(Song1,Song2),Album2(Song1)].']
-            valid = False
-
-        if form.available_times.data == True and form.available_start.data > form.available_end.data:
-            form.available_start.errors = ['Start time must be before end time.']
-            valid = False
-
         # Check if artist form is valid
-        if valid:
+        if form.validate():
             # Edit artist
-            artist.name = form.name.data.strip()
-            genres = ''
-            for genre in form.genres.data:
-                genres = genres + genre + ','
-            artist.genres = genres
-            artist.city = form.city.data.strip()
+            artist.name = form.name.data
+            artist.genres = form.genres.data
+            artist.city = form.city.data
             artist.state = form.state.data
-            artist.phone = form.phone.data.strip() if form.phone.data.strip() != '' else None
-            artist.image_link = form.image_link.data.strip()
-            artist.website_link = form.website_link.data.strip() if form.website_link.data.strip() != '' else None
-            artist.facebook_link = form.facebook_link.data.strip() if form.facebook_link.data.strip() != '' else None
+            artist.phone = form.phone.data or None
+            artist.image_link = form.image_link.data
+            artist.website_link = form.website_link.data or None
+            artist.facebook_link = form.facebook_link.data or None
             artist.seeking_venue = form.seeking_venue.data
-            artist.seeking_description = form.seeking_description.data.strip() if form.seeking_venue.data == True else None
+            artist.seeking_description = form.seeking_description.data if form.seeking_venue.data == True else None
             artist.available_times = form.available_times.data
             artist.available_start = form.available_start.data if form.available_times.data == True else None
             artist.available_end = form.available_end.data if form.available_times.data == True else None
 
-            # Strip albums
-            if form.albums.data.strip() != '':
-                albums = ''
-                albums_str = form.albums.data.strip().replace(')', ',)') + ','
-                for album in albums_str.split('),')[:-1]:
-                    songs = ''
-                    for song in album.split('(')[1].split(',')[:-1]:
-                        songs = songs + song.strip() + ','
-                    albums = albums + album.split('(')[0].strip() + f'({songs}),'
-                artist.albums = albums
-            else:
-                artist.albums = None
+            # Set albums
+            artist.albums = []
+            for position, (name, songs) in enumerate(parse_albums(form.albums.data)):
+                artist.albums.append(Album(name=name, position=position, songs=[Song(name=song, position=i) for i, song in enumerate(songs)]))
+
+            # Genre and album changes alone leave the artist row untouched
+            artist.updated_at = datetime.utcnow()
 
             # Update artist
             try:
+                tags = artist_tags(artist_id)
                 db.session.commit()
+                page_cache.invalidate(*tags)
                 flash(f'Artist {artist.name} was successfully edited!')
             except:
                 db.session.rollback()
@@ -818,8 +702,10 @@ def delete_artist(artist_id):
     if artist:
         # Delete artist
         try:
+            tags = artist_tags(artist_id)
             db.session.delete(artist)
             db.session.commit()
+            page_cache.invalidate(*tags)
             flash(f'Artist {artist.name} was successfully deleted!')
         except:
             db.session.rollback()
@@ -838,80 +724,83 @@ def delete_artist(artist_id):
 
 
 @app.route('/shows')
+@conditional(listing_last_modified)
+@page_cache.cached('shows')
 def shows():
     now = datetime.utcnow()
 
-    # Get upcoming and past shows
-    past_shows = []
+    # Get page of upcoming shows, soonest first
+    upcoming_page = paginate(show_listing().filter(Show.start_time >= now), [Show.start_time, Show.id], request.args.get('upcoming_cursor'), request.args.get('per_page'))
     upcoming_shows = []
-    for show in db.session.query(Show).order_by(Show.start_time).all():
-        if show.start_time < now:
-            past_shows.append({
-                'id': show.id,
-                'venue_id': show.venue.id,
-                'venue_name': show.venue.name,
-                'artist_id': show.artist.id,
-                'artist_name': show.artist.name,
-                'artist_image_link': show.artist.image_link,
-                'start_time': show.start_time.strftime("%Y-%m-%dT%H:%M")
-            })
-        else:
-            upcoming_shows.append({
-                'id': show.id,
-                'venue_id': show.venue.id,
-                'venue_name': show.venue.name,
-                'artist_id': show.artist.id,
-                'artist_name': show.artist.name,
-                'artist_image_link': show.artist.image_link,
-                'start_time': show.start_time.strftime("%Y-%m-%dT%H:%M")
-            })
+    for show in upcoming_page.items:
+        upcoming_shows.append({
+            'id': show.id,
+            'venue_id': show.venue.id,
+            'venue_name': show.venue.name,
+            'artist_id': show.artist.id,
+            'artist_name': show.artist.name,
+            'artist_image_link': show.artist.image_link,
+            'start_time': show.start_time
+        })
+
+    # Get page of past shows, most recent first
+    past_page = paginate(show_listing().filter(Show.start_time < now), [Show.start_time, Show.id], request.args.get('past_cursor'), request.args.get('per_page'), descending=True)
+    past_shows = []
+    for show in past_page.items:
+        past_shows.append({
+            'id': show.id,
+            'venue_id': show.venue.id,
+            'venue_name': show.venue.name,
+            'artist_id': show.artist.id,
+            'artist_name': show.artist.name,
+            'artist_image_link': show.artist.image_link,
+            'start_time': show.start_time
+        })
+
+    # Count upcoming and past shows
+    counts = show_counts(now)
     
     # Render shows
-    return render_template('pages/shows.html', shows={
-            'past_shows': past_shows[::-1],
+    return render_template('pages/shows.html', upcoming_page=upcoming_page, past_page=past_page, shows={
+            'past_shows': past_shows,
             'upcoming_shows': upcoming_shows,
-            'past_shows_count': len(past_shows),
-            'upcoming_shows_count': len(upcoming_shows)
+            'past_shows_count': counts.past,
+            'upcoming_shows_count': counts.upcoming
     })
 
 
-@app.route('/shows/search', methods=['POST'])
+@app.route('/shows/search', methods=['GET', 'POST'])
 @csrf.exempt
 def search_shows():
     shows = []
 
     # Search shows
-    term = request.form.get('search_term', '')
-    by_city = request.form.get('search_city', False)
+    term = request.values.get('search_term', '')
+    by_city = request.values.get('search_city', False)
     if not by_city:
-        for show in db.session.query(Show).join(Show.artist, Show.venue).filter(or_(Artist.name.ilike(f'%{term}%'), Venue.name.ilike(f'%{term}%'))).order_by(Show.start_time).all():
-            # Add show to shows
-            shows.append({
-                'id': show.id,
-                'venue_id': show.venue.id,
-                'venue_name': show.venue.name,
-                'artist_id': show.artist.id,
-                'artist_name': show.artist.name,
-                'artist_image_link': show.artist.image_link,
-                'start_time': show.start_time.strftime("%Y-%m-%dT%H:%M")
-            })
+        results = search.search_shows(term)
     else:
-        city = term.split(', ')[0]
-        state = term.split(', ')[1]
-        for show in db.session.query(Show).join(Show.artist, Show.venue).filter(or_(and_(Artist.city.ilike(f'%{city}%'), Artist.state.ilike(f'%{state}%')), and_(Venue.city.ilike(f'%{city}%'), Venue.state.ilike(f'%{state}%')))).order_by(Show.start_time).all():
-            # Add show to shows
-            shows.append({
-                'id': show.id,
-                'venue_id': show.venue.id,
-                'venue_name': show.venue.name,
-                'artist_id': show.artist.id,
-                'artist_name': show.artist.name,
-                'artist_image_link': show.artist.image_link,
-                'start_time': show.start_time.strftime("%Y-%m-%dT%H:%M")
-            })
+        location = search.parse_location(term)
+        if location is None:
+            flash('Search by city must be in the form (City, State).')
+        results = search.search_shows_in(location)
+
+    # Get page of shows
+    page = paginate(results, [Show.start_time, Show.id], request.values.get('cursor'), request.values.get('per_page'))
+    for show in page.items:
+        # Add show to shows
+        shows.append({
+            'id': show.id,
+            'venue_id': show.venue.id,
+            'venue_name': show.venue.name,
+            'artist_id': show.artist.id,
+            'artist_name': show.artist.name,
+            'artist_image_link': show.artist.image_link,
+            'start_time': show.start_time
+        })
 
     # Render shows
-    return render_template('pages/search_shows.html', results={'count': len(shows), 'data': shows}, search_term=term)
+    return render_template('pages/search_shows.html', results={'count': results.count(), 'data': shows}, page=page, search_term=term, search_city=by_city or None)
 
 
 @app.route('/shows/create')
@@ -928,20 +817,8 @@ def create_show_submission():
     # Get show form
     form = ShowForm(request.form)
 
-    # Validate show form
-    valid = form.validate()
-
-    artist = Artist.query.filter(Artist.id == form.artist_id.data).first()
-    if artist is None:
-        form.artist_id.errors = [f'No artist found with id {form.artist_id.data}.']
-        valid = False
-    elif artist.available_times == True and (form.start_time.data < artist.available_start or form.start_time.data > artist.available_end):
-        form.start_time.errors = ["Artist isn't avaliable at that time."]
-        valid = False
-
-    if Venue.query.filter(Venue.id == form.venue_id.data).first() is None:
-        form.venue_id.errors = [f'No venue found with id {form.venue_id.data}.']
-        valid = False
+    # Validate show form and its booking
+    valid = form.validate() and check_booking(form)
 
     # Check if show form is valid
     if valid:
@@ -955,7 +832,12 @@ def create_show_submission():
         try:
             db.session.add(show)
             db.session.commit()
+            page_cache.invalidate(*show_tags(show.venue_id, show.artist_id))
             flash(f'Show was successfully listed!')
+        except IntegrityError:
+            # Lost a race for the slot to a concurrent booking
+            db.session.rollback()
+            flash('An error occurred. The venue or artist was just booked at that time.')
         except:
             db.session.rollback()
             flash('An error occurred. Show could not be listed.')
@@ -969,6 +851,60 @@ def create_show_submission():
         return render_template('forms/new_show.html', form=form)
 
 
+@app.route('/artists/<int:artist_id>/schedule', methods=['GET'])
+def schedule_shows_form(artist_id):
+    # Check if artist exists
+    if db.session.query(Artist.id).filter(Artist.id == artist_id).first() is None:
+        return render_template('errors/404.html'), 404
+
+    # Create schedule form
+    form = ScheduleForm()
+
+    # Render schedule form
+    return render_template('forms/schedule_shows.html', form=form, artist_id=artist_id)
+
+
+@app.route('/artists/<int:artist_id>/schedule', methods=['POST'])
+def schedule_shows_submission(artist_id):
+    # Check if artist exists
+    if db.session.query(Artist.id).filter(Artist.id == artist_id).first() is None:
+        return render_template('errors/404.html'), 404
+
+    # Get schedule form
+    form = ScheduleForm(request.form)
+
+    # Check if schedule form is valid
+    if form.validate():
+        # Check the whole batch with a fixed number of queries
+        entries, _ = parse_schedule(form.shows.data)
+        shows, rejected = check_show_batch([(line, {'artist_id': artist_id, 'venue_id': venue_id, 'start_time': start_time}) for line, venue_id, start_time in entries])
+        for line, errors in rejected:
+            form.shows.errors.append(f"Line {line}: {' '.join(error for field in errors.values() for error in field)}")
+
+        # Add every show or none of them
+        if not rejected:
+            try:
+                insert_shows(shows)
+                db.session.commit()
+                page_cache.invalidate(*{tag for show in shows for tag in show_tags(show['venue_id'], artist_id)})
+                flash(f'{len(shows)} shows were successfully scheduled!')
+            except IntegrityError:
+                # Lost a race for a slot to a concurrent booking
+                db.session.rollback()
+                flash('An error occurred. A venue or the artist was just booked at one of those times.')
+            except:
+                db.session.rollback()
+                flash('An error occurred. Shows could not be scheduled.')
+            finally:
+                db.session.close()
+
+            # Redirect to artist
+            return redirect(url_for('show_artist', artist_id=artist_id))
+
+    # Schedule form is not valid
+    return render_template('forms/schedule_shows.html', form=form, artist_id=artist_id)
+
+
 @app.route('/shows/<int:show_id>/edit', methods=['GET'])
 def edit_show(show_id):
     # Get show
@@ -999,20 +935,13 @@ def edit_show_submission(show_id):
         # Get show form
         form = ShowForm(request.form)
 
-        # Validate show form
-        valid = form.validate()
-        
-        if Artist.query.filter(Artist.id == form.artist_id.data).first() is None:
-            form.artist_id.errors = [f'No artist found with id {form.artist_id.data}.']
-            valid = False
-
-        if Venue.query.filter(Venue.id == form.venue_id.data).first() is None:
-            form.venue_id.errors = [f'No venue found with id {form.venue_id.data}.']
-            valid = False
+        # Validate show form and its booking
+        valid = form.validate() and check_booking(form, show_id)
 
         # Check if show form is valid
         if valid:
             # Edit show
+            tags = show_tags(show.venue_id, show.artist_id)
             show.artist_id = form.artist_id.data
             show.venue_id = form.venue_id.data
             show.start_time = form.start_time.data
@@ -1020,7 +949,12 @@ def edit_show_submission(show_id):
             # Update show
             try:
                 db.session.commit()
+                page_cache.invalidate(*tags, *show_tags(show.venue_id, show.artist_id))
                 flash(f'Show was successfully edited!')
+            except IntegrityError:
+                # Lost a race for the slot to a concurrent booking
+                db.session.rollback()
+                flash('An error occurred. The venue or artist was just booked at that time.')
             except:
                 db.session.rollback()
                 flash('An error occurred. Show could not be edited.')
@@ -1047,8 +981,10 @@ def delete_show(show_id):
     if show:
         # Delete show
         try:
+            tags = show_tags(show.venue_id, show.artist_id)
             db.session.delete(show)
             db.session.commit()
+            page_cache.invalidate(*tags)
             flash(f'Show was successfully deleted!')
         except:
             db.session.rollback()
@@ -1063,6 +999,15 @@ def delete_show(show_id):
         return render_template('errors/404.html'), 404
 
 
+@app.route('/cache/stats')
+def cache_stats():
+    # Page cache hit and miss counters, for requests bearing STATS_TOKEN or
+    # anyone in debug mode when no token is set
+    if not stats_authorized():
+        abort(404)
+    return jsonify(page_cache.stats())
+
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -1073,7 +1018,7 @@ def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
+if not app.debug and not app.testing:
     file_handler = FileHandler('error.log')
     file_handler.setFormatter(
         Formatter(
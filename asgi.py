@@ -0,0 +1,13 @@
+from a2wsgi import WSGIMiddleware
+from app import app
+
+#----------------------------------------------------------------------------#
+# ASGI.
+#----------------------------------------------------------------------------#
+
+# Serve with any ASGI server, e.g. "uvicorn asgi:application". The event
+# loop only accepts connections and moves bytes; each request runs the
+# Flask app on one of ASGI_THREADS threads, so a slow query holds a single
+# thread instead of the whole worker.
+
+application = WSGIMiddleware(app, workers=app.config['ASGI_THREADS'])
@@ -0,0 +1,38 @@
+"""Per-call cost of the datetime Jinja filter.
+
+Compares the old path (strftime in the view, dateutil parse and a fresh
+Babel pattern in the filter) with format_datetime on datetime objects.
+
+    python benchmarks/datetime_filter.py
+"""
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+import babel.dates
+import dateutil.parser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('FYYUR_CONFIG', 'development')
+from app import format_datetime, DATETIME_FORMATS
+
+CALLS = 10000
+VALUES = [datetime(2026, 1, 1, 20, 0) + timedelta(hours=i) for i in range(CALLS)]
+
+
+def legacy(value, format='medium'):
+    date = dateutil.parser.parse(value.strftime("%Y-%m-%dT%H:%M"))
+    return babel.dates.format_datetime(date, DATETIME_FORMATS[format])
+
+
+def run(name, function):
+    seconds = min(timeit.repeat(lambda: [function(value, 'full') for value in VALUES], number=1, repeat=5))
+    print(f'{name:10} {seconds / CALLS * 1e6:8.2f} us/call')
+    return seconds
+
+
+if __name__ == '__main__':
+    assert all(legacy(value, 'full') == format_datetime(value, 'full') for value in VALUES[:100])
+    before = run('before', legacy)
+    after = run('after', format_datetime)
+    print(f'speedup    {before / after:8.1f}x')
@@ -0,0 +1,144 @@
+"""Load test of the read pages served over WSGI and over ASGI.
+
+Seeds a SQLite database, then serves the app from a subprocess: with a
+single threaded WSGI server, like one gunicorn sync worker, with a WSGI
+server handling requests on ASGI_THREADS threads, like one gunicorn
+gthread worker, and through asgi.py under uvicorn on as many threads, with
+and without the detail pages' queries running at the same time. Every
+statement sleeps for the given latency to stand in for a database on
+another host. The page cache is off so every request reaches the
+database.
+
+    python benchmarks/serving.py [requests] [concurrency] [latency_ms]
+"""
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1] != 'serve' else 400
+CONCURRENCY = int(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[1] != 'serve' else 16
+LATENCY = float(sys.argv[3]) if len(sys.argv) > 3 and sys.argv[1] != 'serve' else 5.0
+PATHS = ['/', '/venues', '/artists', '/shows', '/venues/1', '/artists/1']
+PORT = 5099
+
+
+def environment(database):
+    return dict(
+        os.environ,
+        FYYUR_CONFIG='development',
+        DEBUG='false',
+        DATABASE_URL=f'sqlite:///{database}',
+        DATABASE_REPLICA_URLS='',
+        PAGE_CACHE_BACKEND='none'
+    )
+
+
+def seed():
+    from app import app
+    from models import db, Venue, Artist, Show
+    now = datetime.utcnow()
+    with app.app_context():
+        db.create_all()
+        db.session.execute(Venue.__table__.insert(), [
+            {'id': i, 'name': f'Venue {i}', 'city': 'Austin', 'state': 'TX', 'image_link': 'https://example.com/venue.png', 'seeking_talent': False}
+            for i in range(1, 101)
+        ])
+        db.session.execute(Artist.__table__.insert(), [
+            {'id': i, 'name': f'Artist {i}', 'city': 'Austin', 'state': 'TX', 'image_link': 'https://example.com/artist.png', 'seeking_venue': False, 'available_times': False}
+            for i in range(1, 101)
+        ])
+        db.session.execute(Show.__table__.insert(), [
+            {'artist_id': i % 100 + 1, 'venue_id': i * 7 % 100 + 1, 'start_time': now + timedelta(days=i - 500, hours=i % 24)}
+            for i in range(1000)
+        ])
+        db.session.commit()
+
+
+def serve(server, port, latency):
+    from sqlalchemy import event
+    from app import app
+    from models import db
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: time.sleep(latency / 1000))
+    # Keep the per-request log lines out of the results
+    app.logger.getChild('telemetry').setLevel(logging.WARNING)
+    if server in ('wsgi', 'wsgi-threads'):
+        from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_request(self, *args):
+                pass
+
+        class PooledServer(BaseWSGIServer):
+            # Handles requests on a fixed pool of threads, the same number
+            # asgi.py runs the app on
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.pool = ThreadPoolExecutor(app.config['ASGI_THREADS'])
+
+            def process_request(self, request, client_address):
+                self.pool.submit(self.process_request_thread, request, client_address)
+
+            def process_request_thread(self, request, client_address):
+                try:
+                    self.finish_request(request, client_address)
+                except Exception:
+                    self.handle_error(request, client_address)
+                finally:
+                    self.shutdown_request(request)
+        server_class = PooledServer if server == 'wsgi-threads' else BaseWSGIServer
+        server_class('127.0.0.1', port, app, handler=QuietHandler).serve_forever()
+    else:
+        import uvicorn
+        from asgi import application
+        uvicorn.run(application, host='127.0.0.1', port=port, log_level='warning')
+
+
+def fetch(path):
+    started = time.perf_counter()
+    with urllib.request.urlopen(f'http://127.0.0.1:{PORT}{path}') as response:
+        response.read()
+    return time.perf_counter() - started
+
+
+def load(name, server, env):
+    process = subprocess.Popen([sys.executable, __file__, 'serve', server, str(PORT), str(LATENCY)], env=env)
+    try:
+        # Wait for the server, then warm it up
+        for _ in range(100):
+            try:
+                fetch('/')
+                break
+            except OSError:
+                time.sleep(0.1)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(CONCURRENCY) as executor:
+            latencies = sorted(executor.map(fetch, [PATHS[i % len(PATHS)] for i in range(REQUESTS)]))
+        seconds = time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait()
+    print(f'{name:22} {REQUESTS / seconds:8.1f} requests/s  p50 {latencies[len(latencies) // 2] * 1000:7.1f} ms  p95 {latencies[int(len(latencies) * 0.95)] * 1000:7.1f} ms')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        serve(sys.argv[2], int(sys.argv[3]), float(sys.argv[4]))
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            env = environment(os.path.join(directory, 'serving.db'))
+            os.environ.update(env)
+            seed()
+            print(f'{REQUESTS} requests, {CONCURRENCY} at a time, {LATENCY:g} ms per statement')
+            load('wsgi', 'wsgi', env)
+            load('wsgi, threads', 'wsgi-threads', env)
+            load('asgi', 'asgi', env)
+            load('asgi, serial queries', 'asgi', dict(env, QUERY_EXECUTOR_THREADS='0'))
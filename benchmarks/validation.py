@@ -0,0 +1,55 @@
+"""Throughput of venue form validation over synthetic submissions.
+
+Compares building a VenueForm per submission, as the create page does,
+with validate_records, which re-processes one form for the whole batch.
+
+    python benchmarks/validation.py [submissions]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('FYYUR_CONFIG', 'development')
+from app import app
+from forms import VenueForm, record_formdata, validate_records
+
+SUBMISSIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+
+def submission(i):
+    return {
+        'name': f' Venue {i} ',
+        'city': 'Austin',
+        'state': 'TX',
+        'address': f'{i} Main St',
+        'phone': '512-555-0100' if i % 10 else '5125550100',
+        'genres': 'Jazz,Blues',
+        'image_link': 'https://example.com/venue.png',
+        'website_link': 'https://example.com' if i % 7 else 'example',
+        'facebook_link': '',
+        'seeking_talent': 'y',
+        'seeking_description': 'Looking for jazz trios.'
+    }
+
+
+def per_form(records):
+    return [VenueForm(formdata=record_formdata(record), meta={'csrf': False}).validate() for record in records]
+
+
+def batch(records):
+    return [errors is None for _, errors in validate_records(VenueForm, records)]
+
+
+def run(name, function, records):
+    started = time.perf_counter()
+    results = function(records)
+    seconds = time.perf_counter() - started
+    print(f'{name:10} {len(records) / seconds:10.0f} submissions/s  {seconds / len(records) * 1e6:7.1f} us each')
+    return results
+
+
+if __name__ == '__main__':
+    records = [submission(i) for i in range(SUBMISSIONS)]
+    with app.app_context():
+        assert run('per form', per_form, records) == run('batch', batch, records)
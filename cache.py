@@ -0,0 +1,253 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+from flask import current_app, g, make_response, request, session
+from werkzeug.http import is_resource_modified
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+
+
+class MemoryBackend:
+    # In-process LRU with per-entry expiry
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self.entries[key] = (time.time() + ttl if ttl else None, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class FileSystemBackend:
+    # One pickle file per key, shared by every worker on the host
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as file:
+                expires, value = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires is not None and expires < time.time():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key, value, ttl=None):
+        # Write then rename so readers never see a partial file
+        path = self._path(key)
+        temporary = f'{path}.{uuid.uuid4().hex}'
+        with open(temporary, 'wb') as file:
+            pickle.dump((time.time() + ttl if ttl else None, value), file)
+        os.replace(temporary, path)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+
+class RedisBackend:
+    # Any Redis-protocol server, shared by every worker and host
+
+    def __init__(self, url, prefix='fyyur:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl or None)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+
+
+class PageCache:
+    # Caches rendered GET responses per route and entity. Each page depends
+    # on tags such as 'venues' or 'venue:3'; invalidating a tag gives it a
+    # new version, so every key built from the old version is never read
+    # again and simply ages out of the backend. Tag versions only reach the
+    # processes sharing the backend, so keys also carry the page's last
+    # modified time from conditional, which every process reads from the
+    # database and which moves on writes made anywhere else.
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.ttl = None
+        self.stats_lock = threading.Lock()
+        self.counters = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('PAGE_CACHE_BACKEND', 'memory')
+        if backend == 'memory':
+            self.backend = MemoryBackend(app.config.get('PAGE_CACHE_MAX_ENTRIES', 1024))
+        elif backend == 'filesystem':
+            self.backend = FileSystemBackend(app.config.get('PAGE_CACHE_DIR') or os.path.join(app.instance_path, 'page_cache'))
+        elif backend == 'redis':
+            self.backend = RedisBackend(app.config['PAGE_CACHE_REDIS_URL'])
+        else:
+            self.backend = None
+        self.ttl = app.config.get('PAGE_CACHE_TTL', 60)
+        app.extensions['page_cache'] = self
+
+    def _version(self, tag):
+        # A missing version starts a fresh namespace rather than reusing one
+        version = self.backend.get(f'tag:{tag}')
+        if version is None:
+            version = uuid.uuid4().hex
+            self.backend.set(f'tag:{tag}', version)
+        return version
+
+    def _count(self, endpoint, outcome):
+        with self.stats_lock:
+            counter = self.counters.setdefault(endpoint, {'hits': 0, 'misses': 0})
+            counter[outcome] += 1
+
+    def invalidate(self, *tags):
+        if self.backend is None:
+            return
+        for tag in tags:
+            self.backend.set(f'tag:{tag}', uuid.uuid4().hex)
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        with self.stats_lock:
+            counters = {endpoint: dict(counter) for endpoint, counter in self.counters.items()}
+        hits = sum(counter['hits'] for counter in counters.values())
+        misses = sum(counter['misses'] for counter in counters.values())
+        return {
+            'backend': type(self.backend).__name__ if self.backend else None,
+            'entries': len(self.backend.entries) if isinstance(self.backend, MemoryBackend) else None,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / (hits + misses) if hits + misses else None,
+            'endpoints': counters
+        }
+
+    def cached(self, *tags):
+        # Tags are formatted with the view arguments, e.g. 'venue:{venue_id}'
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                # Pages carrying flashed messages are never served or stored
+                if self.backend is None or request.method != 'GET' or session.get('_flashes'):
+                    return view(**kwargs)
+
+                versions = ':'.join(self._version(tag.format(**kwargs)) for tag in tags)
+                modified = g.get('page_modified')
+                key = f'page:{request.full_path}:{versions}:{modified.isoformat() if modified else ""}'
+                entry = self.backend.get(key)
+                if entry is not None:
+                    self._count(request.endpoint, 'hits')
+                    body, status, mimetype = entry
+                    return current_app.response_class(body, status=status, mimetype=mimetype)
+
+                self._count(request.endpoint, 'misses')
+                response = make_response(view(**kwargs))
+                if response.status_code == 200 and not response.direct_passthrough:
+                    self.backend.set(key, (response.get_data(), response.status_code, response.mimetype), self.ttl)
+                return response
+            return wrapper
+        return decorator
+
+#----------------------------------------------------------------------------#
+# Conditional requests.
+#----------------------------------------------------------------------------#
+
+
+def conditional(last_modified):
+    # Sets ETag and Last-Modified on GET responses and answers a matching
+    # revalidation with 304 before the view or the page cache runs, which
+    # keys its entries on the same time. The last_modified(now, **view_args)
+    # callable returns when the page last changed, or None to always render
+    # the page.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            # Pages carrying flashed messages always render
+            if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+                return view(**kwargs)
+
+            modified = last_modified(datetime.utcnow(), **kwargs)
+            if modified is None:
+                return view(**kwargs)
+
+            g.page_modified = modified
+            etag = hashlib.sha1(f'{request.full_path}:{modified.isoformat()}'.encode()).hexdigest()
+            if is_resource_modified(request.environ, etag, last_modified=modified):
+                response = make_response(view(**kwargs))
+            else:
+                response = current_app.response_class(status=304)
+
+            if response.status_code in (200, 304):
+                response.set_etag(etag)
+                response.last_modified = modified
+                # Let browsers keep the page but revalidate it on every visit
+                response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
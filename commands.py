@@ -0,0 +1,113 @@
+import json
+import time
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+from sqlalchemy import event
+from export import EXPORTS, FORMATS, export_batches
+from importer import BATCH_SIZE, IMPORTERS, import_records, read_records
+from models import db, rolled_at
+from queries import COUNTER_OWNERS, fix_show_counters, refresh_home_feed, roll_over_show_counters, show_counter_mismatches
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+def without_statement_timeout(engine):
+    # Imports, exports and counter checks are bulk work that can outlast
+    # the statement timeout meant for web requests, so reopen the engine's
+    # connections with it turned off
+    if engine.dialect.name != 'postgresql':
+        return
+
+    @event.listens_for(engine, 'do_connect')
+    def connect_without_timeout(dialect, connection_record, cargs, cparams):
+        cparams['options'] = '-c statement_timeout=0'
+
+    engine.dispose()
+
+
+@click.group('fyyur', cls=AppGroup)
+@with_appcontext
+def cli():
+    """Fyyur data commands."""
+    without_statement_timeout(db.engine)
+
+
+@cli.command('export')
+@click.argument('resource', type=click.Choice(list(EXPORTS)))
+@click.option('--format', 'format', type=click.Choice(list(FORMATS)), default='csv', show_default=True)
+@click.option('--output', '-o', type=click.File('w'), default='-', help='File to write, stdout by default.')
+def export_command(resource, format, output):
+    """Stream every venue, artist or show as CSV or NDJSON."""
+    for chunk in export_batches(resource, format):
+        output.write(chunk)
+
+
+@cli.command('import')
+@click.argument('resource', type=click.Choice(list(IMPORTERS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', type=click.IntRange(1), default=BATCH_SIZE, show_default=True, help='Rows per transaction.')
+@click.option('--rejects', type=click.File('w', lazy=False), help='Write rejected rows and their errors here as NDJSON.')
+def import_command(resource, path, batch_size, rejects):
+    """Bulk load venues, artists or shows from a CSV, JSON or NDJSON file."""
+    started = time.perf_counter()
+    try:
+        imported, rejected = import_records(resource, read_records(path), batch_size)
+    except ValueError as error:
+        raise click.ClickException(str(error))
+    elapsed = time.perf_counter() - started
+
+    # Imported rows can appear on any cached page
+    if imported:
+        current_app.extensions['page_cache'].clear()
+
+    # Report rejected rows
+    for number, errors in rejected:
+        if rejects:
+            rejects.write(json.dumps({'row': number, 'errors': errors}) + '\n')
+        else:
+            click.echo(f'Row {number}: ' + '; '.join(f"{field}: {' '.join(messages)}" for field, messages in errors.items()), err=True)
+
+    click.echo(f'Imported {imported} {resource}, rejected {len(rejected)} in {elapsed:.2f}s ({(imported + len(rejected)) / elapsed if elapsed else 0:.0f} rows/s).')
+
+
+@cli.command('refresh-feeds')
+def refresh_feeds_command():
+    """Rebuild the home page feed. Run it every few minutes, e.g. from
+    cron, so upcoming show counts drop shows that have started."""
+    refresh_home_feed()
+    db.session.commit()
+    click.echo('Refreshed the home feed.')
+
+
+@cli.command('roll-over-counters')
+def roll_over_counters_command():
+    """Move shows that have started from the upcoming to the past show
+    counters. Run it every few minutes, e.g. from cron, so pages correct
+    only a short window of recently started shows."""
+    moved = roll_over_show_counters()
+    db.session.commit()
+    click.echo(f'Rolled over {moved} started shows.')
+
+
+@cli.command('check-counters')
+@click.option('--fix', is_flag=True, help='Overwrite wrong counters with recounted values.')
+def check_counters_command(fix):
+    """Verify venue and artist show counters against the shows table."""
+    if fix:
+        # Keep rollovers out while the counters are rewritten
+        rolled_at(db.session.connection(), lock=True)
+    wrong = 0
+    for model, foreign_key in COUNTER_OWNERS:
+        mismatches = show_counter_mismatches(model, foreign_key)
+        for owner_id, upcoming, past, expected_upcoming, expected_past in mismatches:
+            click.echo(f'{model.__tablename__} {owner_id}: stored {upcoming} upcoming and {past} past, counted {expected_upcoming} and {expected_past}', err=True)
+        if fix:
+            fix_show_counters(model, mismatches)
+        wrong += len(mismatches)
+    db.session.commit()
+
+    if wrong and not fix:
+        raise click.ClickException(f'{wrong} venues and artists have wrong show counters, rerun with --fix to correct them.')
+    click.echo(f"{'Fixed' if fix else 'Found'} {wrong} wrong show counters.")
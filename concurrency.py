@@ -0,0 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, g
+
+#----------------------------------------------------------------------------#
+# Query executor.
+#----------------------------------------------------------------------------#
+
+# SQLAlchemy 1.3 and psycopg2 have no asyncio support, so a request's
+# independent queries overlap on threads instead: each call runs on a
+# worker thread inside its own app context, which gives it its own scoped
+# session and pooled connection, and the session is removed when the call
+# returns. Calls must therefore return plain rows or fully loaded objects,
+# and take any request arguments they need from the calling thread.
+# The calling thread hands its own connection back to the pool first:
+# holding it while waiting on calls that each need another one would let a
+# few concurrent requests use up the pool and wait on each other.
+
+# Request globals each call sees as well
+CARRIED_GLOBALS = ('db_replica', 'request_metrics')
+
+
+class QueryExecutor:
+
+    def __init__(self, app=None):
+        self.executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # QUERY_EXECUTOR_THREADS = 0 runs every call inline
+        threads = app.config.get('QUERY_EXECUTOR_THREADS', 8)
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix='fyyur-query') if threads else None
+        app.extensions['query_executor'] = self
+
+    def _in_context(self, call):
+        # Run call in a fresh app context on the request's database route,
+        # counting its statements towards the request's metrics
+        app = current_app._get_current_object()
+        carried = {name: g.get(name) for name in CARRIED_GLOBALS if g.get(name) is not None}
+
+        def run():
+            with app.app_context():
+                for name, value in carried.items():
+                    setattr(g, name, value)
+                return call()
+        return run
+
+    def run(self, *calls):
+        # The results of calls, in order, once the slowest one returns
+        if self.executor is None or len(calls) < 2:
+            return [call() for call in calls]
+        # Ends the read transaction the request's checks ran in, expiring
+        # anything they loaded, so call before any writes
+        current_app.extensions['sqlalchemy'].db.session.commit()
+        futures = [self.executor.submit(self._in_context(call)) for call in calls]
+        try:
+            return [future.result() for future in futures]
+        finally:
+            # A failed call ends the request, so drop its queries still queued
+            for future in futures:
+                future.cancel()
@@ -0,0 +1,104 @@
+import csv
+import io
+import json
+from datetime import datetime
+from models import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Export.
+#----------------------------------------------------------------------------#
+
+# Exports stream rows through a server-side cursor (stream_results with
+# yield_per) and emit text one batch at a time, so memory stays flat no
+# matter how many rows there are and the first bytes go out right away.
+
+BATCH_SIZE = 1000
+
+EXPORTS = {
+    'shows': [
+        Show.id,
+        Show.start_time,
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Show.artist_id,
+        Artist.name.label('artist_name')
+    ],
+    'venues': [
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.address,
+        Venue.phone,
+        Venue.image_link,
+        Venue.website_link,
+        Venue.facebook_link,
+        Venue.seeking_talent,
+        Venue.seeking_description
+    ],
+    'artists': [
+        Artist.id,
+        Artist.name,
+        Artist.city,
+        Artist.state,
+        Artist.phone,
+        Artist.image_link,
+        Artist.website_link,
+        Artist.facebook_link,
+        Artist.seeking_venue,
+        Artist.seeking_description,
+        Artist.available_times,
+        Artist.available_start,
+        Artist.available_end
+    ]
+}
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+
+def export_rows(resource):
+    # Row tuples of the resource in id order, fetched in batches
+    columns = EXPORTS[resource]
+    query = db.session.query(*columns)
+    if resource == 'shows':
+        query = query.join(Venue, Venue.id == Show.venue_id).join(Artist, Artist.id == Show.artist_id)
+    return query.order_by(columns[0]).execution_options(stream_results=True).yield_per(BATCH_SIZE)
+
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _csv_batches(names, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_value(value) for value in row])
+        if count % BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _ndjson_batches(names, rows):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(names, [_value(value) for value in row]))) + '\n')
+        if len(lines) == BATCH_SIZE:
+            yield ''.join(lines)
+            lines = []
+    yield ''.join(lines)
+
+
+def export_batches(resource, format):
+    # Generator of text chunks of the resource as CSV or NDJSON
+    names = [column.key for column in EXPORTS[resource]]
+    rows = export_rows(resource)
+    if format == 'csv':
+        return _csv_batches(names, rows)
+    return _ndjson_batches(names, rows)
@@ -1,10 +1,164 @@
+import re
 from datetime import datetime
 from flask_wtf import FlaskForm as Form
-from wtforms import StringField, BooleanField, SelectField, SelectMultipleField, DateTimeField
+from wtforms import StringField, BooleanField, SelectField, SelectMultipleField, DateTimeField, TextAreaField
 from wtforms.fields.html5 import URLField, IntegerField, DateTimeLocalField
-from wtforms.validators import DataRequired, Regexp, AnyOf, URL, Length
+from werkzeug.datastructures import MultiDict
+from wtforms.validators import DataRequired, Regexp, AnyOf, URL, Length, Optional, StopValidation, ValidationError
 from enums import State, Genre
 
+PHONE_PATTERN = re.compile(r'^[0-9]{3}-[0-9]{3}-[0-9]{4}$')
+URL_PATTERN = re.compile(r"^[a-z]+://(?P<host>[^\/\?:]+)(?P<port>:[0-9]+)?(?P<path>\/.*?)?(?P<query>\?.*)?$")
+ALBUMS_PATTERN = re.compile(r"^([a-z|A-Z|0-9|.| ]+\(([a-z|A-Z|0-9|.|'| ]+,)*\),)+$")
+
+BOOLEAN_FIELDS = {'seeking_talent', 'seeking_venue', 'available_times'}
+DATETIME_FIELDS = {'start_time', 'available_start', 'available_end'}
+FALSE_VALUES = {'', '0', 'false', 'no', 'n', 'off'}
+MAX_SCHEDULE_SHOWS = 200
+
+#----------------------------------------------------------------------------#
+# Validators.
+#----------------------------------------------------------------------------#
+
+
+def strip(value):
+    # Field filter so handlers read trimmed data
+    return value.strip() if isinstance(value, str) else value
+
+
+def optional_phone():
+    return [Optional(), Regexp(PHONE_PATTERN, message='Phone must be in the form (xxx-xxx-xxxx).')]
+
+
+def optional_url(message='Website link must be an URL.'):
+    return [Optional(), Regexp(URL_PATTERN, message=message)]
+
+
+class EnumSelectField(SelectField):
+    # SelectField over an enum, checking membership in a set instead of
+    # scanning every choice on each validation
+    def __init__(self, label=None, validators=None, enum=None, **kwargs):
+        super().__init__(label, validators, choices=enum.choices(), **kwargs)
+        self.values = frozenset(enum.__members__)
+
+    def pre_validate(self, form):
+        if self.data not in self.values:
+            raise ValueError(self.gettext('Not a valid choice'))
+
+
+class EnumSelectMultipleField(SelectMultipleField):
+    # SelectMultipleField over an enum with the same set membership check
+    def __init__(self, label=None, validators=None, enum=None, **kwargs):
+        super().__init__(label, validators, choices=enum.choices(), **kwargs)
+        self.values = frozenset(enum.__members__)
+
+    def pre_validate(self, form):
+        for value in self.data or ():
+            if value not in self.values:
+                raise ValueError(self.gettext("'%(value)s' is not a valid choice for this field") % dict(value=value))
+
+
+def albums_format(form, field):
+    if field.data and not ALBUMS_PATTERN.match(field.data.replace(')', ',)') + ','):
+        raise ValidationError('Albmus must be in the form [Album1(Song1,Song2),Album2(Song1)].')
+
+
+def parse_local_datetime(value):
+    # datetime.fromisoformat, refusing UTC offsets: show times are stored
+    # naive and can't be compared with aware ones
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        raise ValueError('Show times must not have a UTC offset.')
+    return parsed
+
+
+def parse_schedule(text):
+    # ([(line, venue_id, start_time)], [errors]) from one
+    # 'venue_id, YYYY-MM-DDTHH:MM' show per line, skipping blank lines
+    entries, errors = [], []
+    for line, value in enumerate(text.splitlines(), 1):
+        if not value.strip():
+            continue
+        venue_id, _, start_time = value.partition(',')
+        try:
+            entries.append((line, int(venue_id), parse_local_datetime(start_time.strip())))
+        except ValueError:
+            errors.append(f'Line {line} must be in the form (venue_id, YYYY-MM-DDTHH:MM) with no UTC offset.')
+    if len(entries) > MAX_SCHEDULE_SHOWS:
+        errors.append(f'At most {MAX_SCHEDULE_SHOWS} shows can be scheduled at once.')
+    return entries, errors
+
+
+def schedule_format(form, field):
+    # Reports every malformed line, not just the first
+    _, errors = parse_schedule(field.data or '')
+    if errors:
+        field.errors.extend(errors)
+        raise StopValidation()
+
+
+def before_available_end(form, field):
+    if form.available_times.data == True and field.data and form.available_end.data and field.data > form.available_end.data:
+        raise ValidationError('Start time must be before end time.')
+
+#----------------------------------------------------------------------------#
+# Batch validation.
+#----------------------------------------------------------------------------#
+
+
+def record_formdata(record):
+    # MultiDict a form accepts from a plain record: lists or comma separated
+    # strings for genres, falsy booleans left out, and ISO datetimes in the
+    # datetime-local format
+    data = MultiDict()
+    for key, value in record.items():
+        if value is None:
+            continue
+        if key == 'genres':
+            genres = value if isinstance(value, list) else str(value).split(',')
+            for genre in genres:
+                if genre.strip():
+                    data.add(key, genre.strip())
+        elif key in BOOLEAN_FIELDS:
+            if str(value).strip().lower() not in FALSE_VALUES:
+                data.add(key, 'y')
+        elif key in DATETIME_FIELDS:
+            try:
+                data.add(key, datetime.fromisoformat(str(value).strip()).strftime('%Y-%m-%dT%H:%M'))
+            except ValueError:
+                data.add(key, str(value))
+        else:
+            data.add(key, str(value))
+    return data
+
+
+def validate_records(form_class, records):
+    # Validate plain records against one reused form, since building a form
+    # costs as much as validating it. Yields (form.data, None) for valid
+    # records and (None, form.errors) for the rest, in order.
+    form = form_class(formdata=None, meta={'csrf': False})
+    for record in records:
+        form.process(record_formdata(record))
+        if form.validate():
+            yield form.data, None
+        else:
+            yield None, form.errors
+
+
+def parse_albums(albums):
+    # [(album, [songs])] from the 'Album1(Song1,Song2),Album2(Song1)' field
+    parsed = []
+    for album in (albums.strip().replace(')', ',)') + ',').split('),'):
+        if '(' in album:
+            name, _, songs = album.partition('(')
+            parsed.append((name.strip(), [song.strip() for song in songs.split(',') if song.strip()]))
+    return parsed
+
+
+def format_albums(albums):
+    # The field text for a list of {'name', 'songs'} albums
+    return ','.join(f"{album['name']}({','.join(album['songs'])})" for album in albums)
+
 
 class ShowForm(Form):
     artist_id = IntegerField(
@@ -23,43 +177,59 @@ class ShowForm(Form):
     )
 
 
+class ScheduleForm(Form):
+    shows = TextAreaField(
+        'shows',
+        validators=[DataRequired('At least one show is required.'), schedule_format],
+        filters=[strip]
+    )
+
+
 class VenueForm(Form):
     name = StringField(
         'name',
-        validators=[DataRequired('Name is required.')]
+        validators=[DataRequired('Name is required.')],
+        filters=[strip]
     )
     city = StringField(
         'city',
-        validators=[DataRequired('City is required.'), Length(0, 120)]
+        validators=[DataRequired('City is required.'), Length(0, 120)],
+        filters=[strip]
     )
-    state = SelectField(
+    state = EnumSelectField(
         'state',
         validators=[DataRequired('State is required.')],
-        choices=State.choices()
+        enum=State
     )
     address = StringField(
         'address',
-        validators=[Length(0, 120)]
+        validators=[Length(0, 120)],
+        filters=[strip]
     )
     phone = StringField(
-        'phone'
+        'phone',
+        validators=optional_phone(),
+        filters=[strip]
     )
-    genres = SelectMultipleField(
+    genres = EnumSelectMultipleField(
         'genres',
         validators=[DataRequired('At least one genre is required.')],
-        choices=Genre.choices()
+        enum=Genre
     )
     image_link = URLField(
         'image_link',
-        validators=[DataRequired('Image link is required.'), URL(message='Image link must be an URL.'), Length(0, 500)]
+        validators=[DataRequired('Image link is required.'), URL(message='Image link must be an URL.'), Length(0, 500)],
+        filters=[strip]
     )
     website_link = URLField(
         'website_link',
-        validators=[Length(0, 120)]
+        validators=optional_url() + [Length(0, 120)],
+        filters=[strip]
     )
     facebook_link = URLField(
         'facebook_link',
-        validators=[Length(0, 120)]
+        validators=optional_url() + [Length(0, 120)],
+        filters=[strip]
     )
     seeking_talent = BooleanField(
         'seeking_talent',
@@ -67,6 +237,7 @@ class VenueForm(Form):
     )
     seeking_description = StringField(
         'seeking_description',
+        filters=[strip],
         default='We are looking for talent.'
     )
 
@@ -74,40 +245,48 @@ class VenueForm(Form):
 class ArtistForm(Form):
     name = StringField(
         'name',
-        validators=[DataRequired('Name is required.')]
+        validators=[DataRequired('Name is required.')],
+        filters=[strip]
     )
     city = StringField(
         'city',
-        validators=[DataRequired('City is required.'), Length(0, 120)]
+        validators=[DataRequired('City is required.'), Length(0, 120)],
+        filters=[strip]
     )
-    state = SelectField(
+    state = EnumSelectField(
         'state',
         validators=[DataRequired('State is required.')],
-        choices=State.choices()
+        enum=State
     )
     phone = StringField(
-        'phone'
+        'phone',
+        validators=optional_phone(),
+        filters=[strip]
     )
-    genres = SelectMultipleField(
+    genres = EnumSelectMultipleField(
         'genres',
         validators=[DataRequired('At least one genre is required.')],
-        choices=Genre.choices()
+        enum=Genre
     )
     image_link = URLField(
         'image_link',
-        validators=[DataRequired('Image link is required.'), URL(message='Image link must be an URL.'), Length(0, 500)]
+        validators=[DataRequired('Image link is required.'), URL(message='Image link must be an URL.'), Length(0, 500)],
+        filters=[strip]
     )
     website_link = URLField(
         'website_link',
-        validators=[Length(0, 120)]
+        validators=optional_url() + [Length(0, 120)],
+        filters=[strip]
     )
     facebook_link = URLField(
         'facebook_link',
-        validators=[Length(0, 120)]
+        validators=optional_url() + [Length(0, 120)],
+        filters=[strip]
     )
     albums = StringField(
         'albums',
-        validators=[Length(0, 500)]
+        validators=[albums_format],
+        filters=[strip]
     )
     seeking_venue = BooleanField(
         'seeking_venue',
@@ -115,6 +294,7 @@ class ArtistForm(Form):
     )
     seeking_description = StringField(
         'seeking_description',
+        filters=[strip],
         default="I'm looking for venues."
     )
     available_times = BooleanField(
@@ -122,6 +302,7 @@ class ArtistForm(Form):
     )
     available_start = DateTimeLocalField(
         'available_start',
+        validators=[before_available_end],
         default=datetime.utcnow,
         format='%Y-%m-%dT%H:%M'
     )
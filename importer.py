@@ -0,0 +1,191 @@
+import csv
+import json
+import os
+from sqlalchemy import false, func, text
+from forms import VenueForm, ArtistForm, ShowForm, parse_albums, validate_records
+from models import db, Venue, Artist, VenueGenre, ArtistGenre, Album, Song
+from queries import check_show_batch, insert_shows, mark_home_feed_stale
+
+#----------------------------------------------------------------------------#
+# Import.
+#----------------------------------------------------------------------------#
+
+# Records are validated in batches with the same forms as the create pages,
+# then written with one executemany INSERT per table per chunk, each chunk
+# in its own transaction. Parent ids are reserved up front so genre, album
+# and song rows can be inserted without reading ids back row by row.
+
+BATCH_SIZE = 1000
+
+
+def read_records(path):
+    # Dicts from a .csv, .json (list of objects) or .ndjson/.jsonl file,
+    # numbered from 1 in file order
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline='') as file:
+        if extension == '.csv':
+            yield from enumerate(csv.DictReader(file), 1)
+        elif extension in ('.ndjson', '.jsonl'):
+            yield from enumerate((json.loads(line) for line in file if line.strip()), 1)
+        elif extension == '.json':
+            yield from enumerate(json.load(file), 1)
+        else:
+            raise ValueError(f'Unsupported file type {extension}, expected .csv, .json or .ndjson.')
+
+
+def _allocate_ids(model, count):
+    # Reserve count ids for the model's table inside the current transaction.
+    # PostgreSQL hands them out from the table's sequence. Elsewhere an
+    # UPDATE matching no rows first takes the write lock, which SQLite holds
+    # until the chunk commits, so the web app can't insert between reading
+    # max(id) and the chunk's INSERT.
+    if count == 0:
+        return []
+    if db.session.get_bind().dialect.name == 'postgresql':
+        statement = text(f"SELECT nextval(pg_get_serial_sequence('{model.__tablename__}', 'id')) FROM generate_series(1, :count)")
+        return [row[0] for row in db.session.execute(statement, {'count': count})]
+    table = model.__table__
+    db.session.execute(table.update().where(false()).values(id=table.c.id))
+    start = db.session.query(func.coalesce(func.max(model.id), 0)).scalar() + 1
+    return list(range(start, start + count))
+
+
+def _insert(model, rows):
+    if rows:
+        db.session.execute(model.__table__.insert(), rows)
+
+
+def _chunks(records, batch_size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == batch_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+#  Venues
+#  ----------------------------------------------------------------
+
+
+def venue_values(data):
+    # Column values and genres from validated venue form data
+    return {
+        'name': data['name'],
+        'address': data['address'] or None,
+        'city': data['city'],
+        'state': data['state'],
+        'phone': data['phone'] or None,
+        'image_link': data['image_link'],
+        'website_link': data['website_link'] or None,
+        'facebook_link': data['facebook_link'] or None,
+        'seeking_talent': data['seeking_talent'],
+        'seeking_description': data['seeking_description'] if data['seeking_talent'] == True else None
+    }, data['genres']
+
+
+def _write_venues(rows):
+    ids = _allocate_ids(Venue, len(rows))
+    genres = []
+    for venue_id, (values, venue_genres) in zip(ids, rows):
+        values['id'] = venue_id
+        genres.extend({'venue_id': venue_id, 'genre': genre} for genre in set(venue_genres))
+    _insert(Venue, [values for values, _ in rows])
+    _insert(VenueGenre, genres)
+
+#  Artists
+#  ----------------------------------------------------------------
+
+
+def artist_values(data):
+    # Column values, genres and albums from validated artist form data
+    return {
+        'name': data['name'],
+        'city': data['city'],
+        'state': data['state'],
+        'phone': data['phone'] or None,
+        'image_link': data['image_link'],
+        'website_link': data['website_link'] or None,
+        'facebook_link': data['facebook_link'] or None,
+        'seeking_venue': data['seeking_venue'],
+        'seeking_description': data['seeking_description'] if data['seeking_venue'] == True else None,
+        'available_times': data['available_times'],
+        'available_start': data['available_start'] if data['available_times'] == True else None,
+        'available_end': data['available_end'] if data['available_times'] == True else None
+    }, (data['genres'], parse_albums(data['albums']))
+
+
+def _write_artists(rows):
+    ids = _allocate_ids(Artist, len(rows))
+    album_ids = iter(_allocate_ids(Album, sum(len(albums) for _, (_, albums) in rows)))
+    genres, albums, songs = [], [], []
+    for artist_id, (values, (artist_genres, artist_albums)) in zip(ids, rows):
+        values['id'] = artist_id
+        genres.extend({'artist_id': artist_id, 'genre': genre} for genre in set(artist_genres))
+        for position, (name, album_songs) in enumerate(artist_albums):
+            album_id = next(album_ids)
+            albums.append({'id': album_id, 'artist_id': artist_id, 'name': name, 'position': position})
+            songs.extend({'album_id': album_id, 'name': song, 'position': i} for i, song in enumerate(album_songs))
+    _insert(Artist, [values for values, _ in rows])
+    _insert(ArtistGenre, genres)
+    _insert(Album, albums)
+    _insert(Song, songs)
+
+#  Shows
+#  ----------------------------------------------------------------
+
+
+def show_values(data):
+    # Column values from validated show form data; references are checked
+    # per chunk
+    return {
+        'artist_id': data['artist_id'],
+        'venue_id': data['venue_id'],
+        'start_time': data['start_time']
+    }, None
+
+#  Runner
+#  ----------------------------------------------------------------
+
+IMPORTERS = {
+    'venues': (VenueForm, venue_values),
+    'artists': (ArtistForm, artist_values),
+    'shows': (ShowForm, show_values)
+}
+
+
+def import_records(resource, records, batch_size=BATCH_SIZE):
+    # Validate and insert numbered records chunk by chunk. Returns the
+    # number imported and a list of (record number, errors) rejections.
+    form_class, to_values = IMPORTERS[resource]
+    imported, rejected = 0, []
+    for chunk in _chunks(records, batch_size):
+        rows = []
+        for (number, _), (data, errors) in zip(chunk, validate_records(form_class, [record for _, record in chunk])):
+            if errors:
+                rejected.append((number, errors))
+                continue
+            values, extra = to_values(data)
+            if resource == 'shows':
+                rows.append((number, values))
+            else:
+                rows.append((values, extra))
+
+        try:
+            if resource == 'venues':
+                _write_venues(rows)
+            elif resource == 'artists':
+                _write_artists(rows)
+            else:
+                rows, chunk_rejected = check_show_batch(rows)
+                rejected.extend(chunk_rejected)
+                if rows:
+                    insert_shows(rows)
+            mark_home_feed_stale()
+            db.session.commit()
+        except:
+            db.session.rollback()
+            raise
+        imported += len(rows)
+    return imported, rejected
@@ -72,10 +72,17 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    # index builds and backfills can outlast the app's statement timeout,
+    # so migrations run without one, whatever the server or role sets
+    connect_args = {}
+    if config.get_main_option('sqlalchemy.url').startswith('postgres'):
+        connect_args['options'] = '-c statement_timeout=0'
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section),
         prefix='sqlalchemy.',
         poolclass=pool.NullPool,
+        connect_args=connect_args,
     )
 
     with connectable.connect() as connection:
@@ -0,0 +1,51 @@
+"""add name search indexes
+
+Revision ID: a84e6d0c52f1
+Revises: 3f2b8c1d9a47
+Create Date: 2026-10-18 11:03:27.904518
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a84e6d0c52f1'
+down_revision = '3f2b8c1d9a47'
+branch_labels = None
+depends_on = None
+
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(name, content='{table}', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN "
+    "INSERT INTO {table}_fts(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN "
+    "INSERT INTO {table}_fts({table}_fts, rowid, name) VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF name ON {table} BEGIN "
+    "INSERT INTO {table}_fts({table}_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+    "INSERT INTO {table}_fts(rowid, name) VALUES (new.id, new.name); END",
+    "INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')"
+]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.create_index('ix_venues_name_trgm', 'venues', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+        op.create_index('ix_artists_name_trgm', 'artists', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    elif dialect == 'sqlite':
+        for table in ('venues', 'artists'):
+            for statement in SQLITE_FTS_DDL:
+                op.execute(statement.format(table=table))
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.drop_index('ix_artists_name_trgm', table_name='artists')
+        op.drop_index('ix_venues_name_trgm', table_name='venues')
+    elif dialect == 'sqlite':
+        for table in ('artists', 'venues'):
+            for trigger in ('insert', 'delete', 'update'):
+                op.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{trigger}')
+            op.execute(f'DROP TABLE IF EXISTS {table}_fts')
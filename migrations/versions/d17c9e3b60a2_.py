@@ -0,0 +1,27 @@
+"""add location search indexes
+
+Revision ID: d17c9e3b60a2
+Revises: a84e6d0c52f1
+Create Date: 2026-10-18 11:48:05.217644
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd17c9e3b60a2'
+down_revision = 'a84e6d0c52f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # text_pattern_ops lets PostgreSQL serve the city prefix LIKE from the index
+    ops = ' text_pattern_ops' if op.get_bind().dialect.name == 'postgresql' else ''
+    op.execute(f'CREATE INDEX ix_venues_state_city ON venues (state, lower(city){ops})')
+    op.execute(f'CREATE INDEX ix_artists_state_city ON artists (state, lower(city){ops})')
+
+
+def downgrade():
+    op.drop_index('ix_artists_state_city', table_name='artists')
+    op.drop_index('ix_venues_state_city', table_name='venues')
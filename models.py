@@ -0,0 +1,252 @@
+from datetime import datetime
+from sqlalchemy import bindparam, event, inspect, select
+from sqlalchemy.ext.associationproxy import association_proxy
+from replicas import RoutingSQLAlchemy
+
+db = RoutingSQLAlchemy()
+
+#----------------------------------------------------------------------------#
+# Models.
+#----------------------------------------------------------------------------#
+
+
+class Venue(db.Model):
+    __tablename__ = 'venues'
+    __table_args__ = (
+        db.Index('ix_venues_updated_at', 'updated_at'),
+        db.Index('ix_venues_created_date', 'created_date'),
+        # Keyset pagination keys of the area listing and of the name
+        # ordered genre and city search listings
+        db.Index('ix_venues_city_state_name_id', 'city', 'state', 'name', 'id'),
+        db.Index('ix_venues_name_id', 'name', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, nullable=False)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
+    address = db.Column(db.String(120), nullable=True)
+    phone = db.Column(db.String(120), nullable=True)
+    image_link = db.Column(db.String(500), nullable=False)
+    website_link = db.Column(db.String(120), nullable=True)
+    facebook_link = db.Column(db.String(120), nullable=True)
+    seeking_talent = db.Column(db.Boolean(), nullable=False)
+    seeking_description = db.Column(db.String(), nullable=True)
+    created_date = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Shows starting at or after the last rollover, and before it
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    shows = db.relationship('Show', backref='venue', lazy=True, cascade='delete')
+    genre_rows = db.relationship('VenueGenre', lazy=True, cascade='all, delete-orphan')
+    genres = association_proxy('genre_rows', 'genre', creator=lambda genre: VenueGenre(genre=genre))
+    
+
+class Artist(db.Model):
+    __tablename__ = 'artists'
+    __table_args__ = (
+        db.Index('ix_artists_updated_at', 'updated_at'),
+        db.Index('ix_artists_created_date', 'created_date'),
+        # Keyset pagination keys of the listing, genre and city searches
+        db.Index('ix_artists_name_id', 'name', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, nullable=False)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
+    phone = db.Column(db.String(120), nullable=True)
+    image_link = db.Column(db.String(500), nullable=False)
+    website_link = db.Column(db.String(120), nullable=True)
+    facebook_link = db.Column(db.String(120), nullable=True)
+    seeking_venue = db.Column(db.Boolean(), nullable=False)
+    seeking_description = db.Column(db.String(), nullable=True)
+    available_times = db.Column(db.Boolean(), nullable=False)
+    available_start = db.Column(db.DateTime(), nullable=True)
+    available_end = db.Column(db.DateTime(), nullable=True)
+    created_date = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Shows starting at or after the last rollover, and before it
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    shows = db.relationship('Show', backref='artist', lazy=True, cascade='delete')
+    genre_rows = db.relationship('ArtistGenre', lazy=True, cascade='all, delete-orphan')
+    albums = db.relationship('Album', lazy=True, cascade='all, delete-orphan', order_by='Album.position')
+    genres = association_proxy('genre_rows', 'genre', creator=lambda genre: ArtistGenre(genre=genre))
+
+
+class Show(db.Model):
+    __tablename__ = 'shows'
+    __table_args__ = (
+        # Unique, so a venue or artist can't be double-booked at a time
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time', unique=True),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time', unique=True),
+        db.Index('ix_shows_start_time', 'start_time'),
+        db.Index('ix_shows_updated_at', 'updated_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    artist_id = db.Column(db.ForeignKey('artists.id'), nullable=False)
+    venue_id = db.Column(db.ForeignKey('venues.id'), nullable=False)
+    start_time = db.Column(db.DateTime(), nullable=False)
+    created_date = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class VenueGenre(db.Model):
+    __tablename__ = 'venue_genres'
+    __table_args__ = (
+        db.Index('ix_venue_genres_genre_venue_id', 'genre', 'venue_id'),
+    )
+    venue_id = db.Column(db.ForeignKey('venues.id', ondelete='CASCADE'), primary_key=True)
+    genre = db.Column(db.String(50), primary_key=True)
+
+
+class ArtistGenre(db.Model):
+    __tablename__ = 'artist_genres'
+    __table_args__ = (
+        db.Index('ix_artist_genres_genre_artist_id', 'genre', 'artist_id'),
+    )
+    artist_id = db.Column(db.ForeignKey('artists.id', ondelete='CASCADE'), primary_key=True)
+    genre = db.Column(db.String(50), primary_key=True)
+
+
+class Album(db.Model):
+    __tablename__ = 'albums'
+    __table_args__ = (
+        db.Index('ix_albums_artist_id_position', 'artist_id', 'position'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    artist_id = db.Column(db.ForeignKey('artists.id', ondelete='CASCADE'), nullable=False)
+    name = db.Column(db.String(), nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+    songs = db.relationship('Song', lazy=True, cascade='all, delete-orphan', order_by='Song.position')
+
+
+class Song(db.Model):
+    __tablename__ = 'songs'
+    __table_args__ = (
+        db.Index('ix_songs_album_id_position', 'album_id', 'position'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    album_id = db.Column(db.ForeignKey('albums.id', ondelete='CASCADE'), nullable=False)
+    name = db.Column(db.String(), nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+
+
+class Deletion(db.Model):
+    # Time of the latest delete from each table, so pages keep changing
+    # their Last-Modified when rows disappear
+    __tablename__ = 'deletions'
+    table_name = db.Column(db.String(50), primary_key=True)
+    deleted_at = db.Column(db.DateTime(), nullable=False)
+
+
+class Feed(db.Model):
+    # Precomputed lists rendered as is, such as the home page's, rebuilt in
+    # the transactions that change their rows
+    __tablename__ = 'feeds'
+    name = db.Column(db.String(50), primary_key=True)
+    items = db.Column(db.JSON(), nullable=True)
+    refreshed_at = db.Column(db.DateTime(), nullable=True)
+
+
+class Rollover(db.Model):
+    # Time up to which started shows were moved from the upcoming to the
+    # past counters of their venue and artist
+    __tablename__ = 'rollovers'
+    name = db.Column(db.String(50), primary_key=True)
+    rolled_at = db.Column(db.DateTime(), nullable=False)
+
+
+@event.listens_for(Venue, 'after_delete')
+@event.listens_for(Artist, 'after_delete')
+@event.listens_for(Show, 'after_delete')
+def record_deletion(mapper, connection, target):
+    # Upsert the table's deletion time in the flush deleting the row
+    deletions = Deletion.__table__
+    table_name = mapper.local_table.name
+    deleted_at = datetime.utcnow()
+    if connection.execute(deletions.update().where(deletions.c.table_name == table_name).values(deleted_at=deleted_at)).rowcount == 0:
+        connection.execute(deletions.insert().values(table_name=table_name, deleted_at=deleted_at))
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+# Venues and artists count their shows starting at or after the last
+# rollover as upcoming and earlier ones as past. Shows written through the
+# ORM adjust both owners in the same flush; executemany INSERTs call
+# count_shows themselves.
+
+SHOW_ROLLOVER = 'shows'
+COUNTED_OWNERS = ((Venue, 0), (Artist, 1))
+
+
+def rolled_at(connection, lock=False):
+    # The upcoming/past boundary, or None before the first rollover. Writers
+    # share-lock its single row on purpose, so a rollover can't move it under
+    # their transaction: share locks don't block each other, only the
+    # rollover's exclusive lock waits for the writers holding one.
+    rollovers = Rollover.__table__
+    query = select([rollovers.c.rolled_at]).where(rollovers.c.name == SHOW_ROLLOVER)
+    return connection.execute(query.with_for_update(read=not lock)).scalar()
+
+
+def update_show_counters(connection, model, deltas):
+    # Add {owner_id: (upcoming, past)} to the owners' counters. Rows are
+    # updated in id order, venues before artists, so concurrent batches
+    # touching the same owners take their row locks in the same order
+    # instead of deadlocking.
+    table = model.__table__
+    params = [{'owner_id': owner_id, 'upcoming': upcoming, 'past': past} for owner_id, (upcoming, past) in sorted(deltas.items()) if upcoming or past]
+    if params:
+        connection.execute(table.update().where(table.c.id == bindparam('owner_id')).values(
+            upcoming_shows_count=table.c.upcoming_shows_count + bindparam('upcoming'),
+            past_shows_count=table.c.past_shows_count + bindparam('past'),
+            # Counts shown on pages don't change, so keep Last-Modified
+            updated_at=table.c.updated_at
+        ), params)
+
+
+def count_shows(connection, added=(), removed=()):
+    # Count added and uncount removed (venue_id, artist_id, start_time) shows
+    boundary = rolled_at(connection)
+    for model, position in COUNTED_OWNERS:
+        deltas = {}
+        for shows, sign in ((added, 1), (removed, -1)):
+            for show in shows:
+                upcoming, past = deltas.get(show[position], (0, 0))
+                if boundary is None or show[2] >= boundary:
+                    upcoming += sign
+                else:
+                    past += sign
+                deltas[show[position]] = (upcoming, past)
+        update_show_counters(connection, model, deltas)
+
+
+def _show_keys(target, values=getattr):
+    return tuple(values(target, key) for key in ('venue_id', 'artist_id', 'start_time'))
+
+
+def _previous(target, key):
+    # The value loaded before this flush changed it
+    history = inspect(target).attrs[key].history
+    return history.deleted[0] if history.deleted else getattr(target, key)
+
+
+@event.listens_for(Show, 'after_insert')
+def count_inserted_show(mapper, connection, target):
+    count_shows(connection, added=[_show_keys(target)])
+
+
+@event.listens_for(Show, 'after_delete')
+def count_deleted_show(mapper, connection, target):
+    count_shows(connection, removed=[_show_keys(target)])
+
+
+@event.listens_for(Show, 'after_update')
+def count_updated_show(mapper, connection, target):
+    # Move the show between owners or buckets when its keys changed
+    before, after = _show_keys(target, _previous), _show_keys(target)
+    if before != after:
+        count_shows(connection, added=[after], removed=[before])
@@ -0,0 +1,486 @@
+import base64
+import json
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import chain, groupby
+from flask import current_app, has_app_context
+from sqlalchemy import and_, bindparam, event, exists, func, or_, select, tuple_
+from sqlalchemy.orm import contains_eager
+from models import db, Venue, Artist, Show, Album, Song, Deletion, Feed, Rollover, SHOW_ROLLOVER, COUNTED_OWNERS, count_shows, rolled_at, update_show_counters
+
+#----------------------------------------------------------------------------#
+# Listing queries.
+#----------------------------------------------------------------------------#
+
+
+def started_since_rollover(foreign_key, owner_id, now):
+    # The owner's shows still counted as upcoming that have started by now,
+    # a short index range that stays small while rollovers run regularly
+    boundary = func.coalesce(select([Rollover.rolled_at]).where(Rollover.name == SHOW_ROLLOVER).as_scalar(), datetime.min)
+    return select([func.count(Show.id)]).where(and_(foreign_key == owner_id, Show.start_time >= boundary, Show.start_time < now)).as_scalar()
+
+
+def upcoming_shows_count(model, foreign_key, now):
+    # The owner's upcoming show counter, corrected for shows started since
+    # the last rollover
+    return (model.upcoming_shows_count - started_since_rollover(foreign_key, model.id, now)).label('num_upcoming_shows')
+
+
+def past_shows_count(model, foreign_key, now):
+    return (model.past_shows_count + started_since_rollover(foreign_key, model.id, now)).label('num_past_shows')
+
+
+def owner_show_counts(model, foreign_key, owner_id, now):
+    # Past and upcoming totals of one venue or artist from its counters
+    return db.session.query(
+        past_shows_count(model, foreign_key, now).label('past'),
+        upcoming_shows_count(model, foreign_key, now).label('upcoming')
+    ).filter(model.id == owner_id).first()
+
+
+def venue_listing(now=None):
+    # Venue rows (id, name, city, state, num_upcoming_shows) in one query
+    now = now or datetime.utcnow()
+    return db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        upcoming_shows_count(Venue, Show.venue_id, now)
+    )
+
+
+def artist_listing(now=None):
+    # Artist rows (id, name, city, state, num_upcoming_shows) in one query
+    now = now or datetime.utcnow()
+    return db.session.query(
+        Artist.id,
+        Artist.name,
+        Artist.city,
+        Artist.state,
+        upcoming_shows_count(Artist, Show.artist_id, now)
+    )
+
+
+def show_listing():
+    # Shows joined with their artist and venue, loading only the columns
+    # the show tiles render so no show triggers extra SELECTs
+    return db.session.query(Show).join(Show.artist).join(Show.venue).options(
+        contains_eager(Show.artist).load_only('id', 'name', 'image_link'),
+        contains_eager(Show.venue).load_only('id', 'name', 'image_link')
+    )
+
+
+def show_counts(now, *criteria):
+    # Past and upcoming totals of the shows matching the criteria in one query
+    return db.session.query(
+        func.count(Show.id).filter(Show.start_time < now).label('past'),
+        func.count(Show.id).filter(Show.start_time >= now).label('upcoming')
+    ).filter(*criteria).one()
+
+
+def show_booking(artist_id, venue_id, start_time, show_id=None):
+    # Whether the artist and venue exist, the artist is available and either
+    # is already booked at start_time, all in one query. show_id excludes
+    # the show being edited from the booking checks. A missing availability
+    # bound leaves that side open.
+    others = Show.id != show_id if show_id is not None else True
+    return db.session.query(
+        exists().where(Artist.id == artist_id).label('artist_exists'),
+        exists().where(and_(Artist.id == artist_id, or_(
+            Artist.available_times == False,
+            and_(or_(Artist.available_start == None, Artist.available_start <= start_time),
+                 or_(Artist.available_end == None, Artist.available_end >= start_time))
+        ))).label('artist_available'),
+        exists().where(Venue.id == venue_id).label('venue_exists'),
+        exists().where(and_(Show.venue_id == venue_id, Show.start_time == start_time, others)).label('venue_booked'),
+        exists().where(and_(Show.artist_id == artist_id, Show.start_time == start_time, others)).label('artist_booked')
+    ).one()
+
+
+def available_at(artist, start_time):
+    # show_booking's availability window in Python; a missing bound is open
+    return (artist.available_start is None or artist.available_start <= start_time) and \
+        (artist.available_end is None or artist.available_end >= start_time)
+
+
+def booked_slots(foreign_key, slots):
+    # The (owner id, start_time) pairs among slots that already have a show.
+    # Expanding IN lists compile once however many slots a batch has; the
+    # owners by times superset they match is narrowed to the slots here.
+    if not slots:
+        return set()
+    booked = db.session.query(foreign_key, Show.start_time) \
+        .filter(foreign_key.in_(bindparam('owner_ids', expanding=True)), Show.start_time.in_(bindparam('start_times', expanding=True))) \
+        .params(owner_ids=list({owner_id for owner_id, _ in slots}), start_times=list({start_time for _, start_time in slots}))
+    return {slot for slot in booked if slot in slots}
+
+
+def check_show_batch(rows):
+    # Split numbered show rows into accepted values and (number, errors)
+    # for a missing artist or venue, an unavailable artist or a double
+    # booking, already or within the batch, with four queries in total
+    artists = {row.id: row for row in db.session.query(Artist.id, Artist.available_times, Artist.available_start, Artist.available_end)
+               .filter(Artist.id.in_(bindparam('artist_ids', expanding=True)))
+               .params(artist_ids=list({values['artist_id'] for _, values in rows}))}
+    venue_ids = {venue_id for venue_id, in db.session.query(Venue.id).filter(Venue.id.in_(bindparam('venue_ids', expanding=True)))
+                 .params(venue_ids=list({values['venue_id'] for _, values in rows}))}
+    venue_slots = booked_slots(Show.venue_id, {(values['venue_id'], values['start_time']) for _, values in rows})
+    artist_slots = booked_slots(Show.artist_id, {(values['artist_id'], values['start_time']) for _, values in rows})
+    accepted, rejected = [], []
+    for number, values in rows:
+        errors = {}
+        artist = artists.get(values['artist_id'])
+        artist_slot = (values['artist_id'], values['start_time'])
+        venue_slot = (values['venue_id'], values['start_time'])
+        if artist is None:
+            errors['artist_id'] = [f"No artist found with id {values['artist_id']}."]
+        elif artist.available_times == True and not available_at(artist, values['start_time']):
+            errors['start_time'] = ["Artist isn't avaliable at that time."]
+        elif artist_slot in artist_slots:
+            errors['start_time'] = ['Artist is already booked at that time.']
+        if values['venue_id'] not in venue_ids:
+            errors['venue_id'] = [f"No venue found with id {values['venue_id']}."]
+        elif venue_slot in venue_slots:
+            errors.setdefault('start_time', []).append('Venue is already booked at that time.')
+        if errors:
+            rejected.append((number, errors))
+        else:
+            # Later rows of the batch can't take the same slots
+            artist_slots.add(artist_slot)
+            venue_slots.add(venue_slot)
+            accepted.append(values)
+    return accepted, rejected
+
+
+def insert_shows(shows):
+    # Write show value dicts with one executemany INSERT, keeping the
+    # counters and the home feed in step as the ORM path does
+    db.session.execute(Show.__table__.insert(), shows)
+    count_shows(db.session.connection(), added=[(show['venue_id'], show['artist_id'], show['start_time']) for show in shows])
+    mark_home_feed_stale()
+
+
+def artist_albums(artist_id):
+    # The artist's albums with their songs from one batched query
+    rows = db.session.query(Album.id, Album.name, Song.name.label('song')) \
+        .outerjoin(Song, Song.album_id == Album.id) \
+        .filter(Album.artist_id == artist_id) \
+        .order_by(Album.position, Album.id, Song.position)
+    albums = []
+    for (_, name), songs in groupby(rows, key=lambda row: (row.id, row.name)):
+        songs = [row.song for row in songs if row.song is not None]
+        albums.append({
+            'name': name,
+            'songs': songs,
+            'songs_count': len(songs)
+        })
+    return albums
+
+#----------------------------------------------------------------------------#
+# Home feed.
+#----------------------------------------------------------------------------#
+
+# The home page renders one precomputed feeds row instead of sorting the
+# venue and artist tables on every visit. Once a transaction that wrote
+# venues, artists or shows commits, the row is rebuilt on a background
+# thread in a transaction of its own, so writers never run the rebuild or
+# wait on the feed row. Writes committed while a rebuild is queued share
+# it. "flask fyyur refresh-feeds" run periodically picks up shows that
+# have started since, which no write announces.
+
+HOME_FEED = 'home'
+HOME_FEED_SIZE = 10
+FEED_MODELS = (Venue, Artist, Show)
+
+
+def home_feed_items(now):
+    # Recently listed venues and artists, and the venues with the most
+    # upcoming shows
+    upcoming = func.count(Show.id).label('num_upcoming_shows')
+    trending = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state, upcoming) \
+        .join(Show, Show.venue_id == Venue.id) \
+        .filter(Show.start_time > now) \
+        .group_by(Venue.id, Venue.name, Venue.city, Venue.state) \
+        .order_by(upcoming.desc(), Venue.id).limit(HOME_FEED_SIZE)
+    return {
+        'venues': [row._asdict() for row in venue_listing(now).order_by(Venue.created_date.desc()).limit(HOME_FEED_SIZE)],
+        'artists': [row._asdict() for row in artist_listing(now).order_by(Artist.created_date.desc()).limit(HOME_FEED_SIZE)],
+        'trending_venues': [row._asdict() for row in trending]
+    }
+
+
+def home_feed(now):
+    # The stored home feed, or one built on the fly before its first refresh
+    items = db.session.query(Feed.items).filter(Feed.name == HOME_FEED, Feed.refreshed_at.isnot(None)).scalar()
+    return items if items is not None else home_feed_items(now)
+
+
+def refresh_home_feed(now=None):
+    # Rebuild the home feed in the current transaction
+    now = now or datetime.utcnow()
+    feeds = Feed.__table__
+    values = {'items': home_feed_items(now), 'refreshed_at': now}
+    if db.session.execute(feeds.update().where(feeds.c.name == HOME_FEED).values(**values)).rowcount == 0:
+        db.session.execute(feeds.insert().values(name=HOME_FEED, **values))
+
+
+class FeedRefresher:
+    # Rebuilds the home feed on one background thread, at most one rebuild
+    # queued at a time
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix='fyyur-feed')
+        self.lock = threading.Lock()
+        self.queued = False
+
+    def schedule(self, app):
+        with self.lock:
+            if self.queued:
+                return
+            self.queued = True
+        self.executor.submit(self._refresh, app)
+
+    def _refresh(self, app):
+        # Writes committed from here on queue the next rebuild
+        with self.lock:
+            self.queued = False
+        with app.app_context():
+            try:
+                refresh_home_feed()
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('Refreshing the home feed failed.')
+
+
+home_feed_refresher = FeedRefresher()
+
+
+def mark_home_feed_stale():
+    # For writes the session can't see, such as executemany INSERTs
+    db.session.info['home_feed_stale'] = True
+
+
+@event.listens_for(db.session, 'after_flush')
+def _mark_flushed_feed_rows(session, context):
+    if any(isinstance(instance, FEED_MODELS) for instance in chain(session.new, session.dirty, session.deleted)):
+        session.info['home_feed_stale'] = True
+
+
+@event.listens_for(db.session, 'after_commit')
+def _refresh_stale_home_feed(session):
+    # HOME_FEED_BACKGROUND_REFRESH = False leaves it to refresh-feeds
+    if session.info.pop('home_feed_stale', False) and has_app_context() and current_app.config.get('HOME_FEED_BACKGROUND_REFRESH', True):
+        home_feed_refresher.schedule(current_app._get_current_object())
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_stale_home_feed(session):
+    session.info.pop('home_feed_stale', None)
+
+#----------------------------------------------------------------------------#
+# Cache invalidation.
+#----------------------------------------------------------------------------#
+
+
+def venue_tags(venue_id):
+    # Cached pages showing the venue, including artists playing there
+    artist_ids = db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct().all()
+    return [f'venue:{venue_id}', 'venues', 'shows'] + [f'artist:{artist_id}' for artist_id, in artist_ids]
+
+
+def artist_tags(artist_id):
+    # Cached pages showing the artist, including venues they play at
+    venue_ids = db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct().all()
+    return [f'artist:{artist_id}', 'artists', 'shows'] + [f'venue:{venue_id}' for venue_id, in venue_ids]
+
+
+def show_tags(venue_id, artist_id):
+    # Cached pages listing the show or counting it
+    return [f'venue:{venue_id}', f'artist:{artist_id}', 'venues', 'artists', 'shows']
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+COUNTER_OWNERS = ((Venue, Show.venue_id), (Artist, Show.artist_id))
+
+
+def roll_over_show_counters(now=None):
+    # Move shows that started since the last rollover from the upcoming to
+    # the past counters, in the current transaction. Returns how many moved.
+    now = now or datetime.utcnow()
+    connection = db.session.connection()
+
+    # Lock the boundary first, so show writes wait for this commit
+    boundary = rolled_at(connection, lock=True)
+    started = db.session.query(Show.venue_id, Show.artist_id) \
+        .filter(Show.start_time >= (boundary or datetime.min), Show.start_time < now).all()
+    for model, position in COUNTED_OWNERS:
+        deltas = {}
+        for show in started:
+            upcoming, past = deltas.get(show[position], (0, 0))
+            deltas[show[position]] = (upcoming - 1, past + 1)
+        update_show_counters(connection, model, deltas)
+
+    rollovers = Rollover.__table__
+    if connection.execute(rollovers.update().where(rollovers.c.name == SHOW_ROLLOVER).values(rolled_at=now)).rowcount == 0:
+        connection.execute(rollovers.insert().values(name=SHOW_ROLLOVER, rolled_at=now))
+    return len(started)
+
+
+def show_counter_mismatches(model, foreign_key):
+    # (id, stored upcoming, stored past, upcoming, past) of every owner whose
+    # counters disagree with its shows, from one consistent snapshot
+    boundary = func.coalesce(select([Rollover.rolled_at]).where(Rollover.name == SHOW_ROLLOVER).as_scalar(), datetime.min)
+    upcoming = func.count(Show.id).filter(Show.start_time >= boundary)
+    past = func.count(Show.id).filter(Show.start_time < boundary)
+    return db.session.query(model.id, model.upcoming_shows_count, model.past_shows_count, upcoming, past) \
+        .outerjoin(Show, foreign_key == model.id) \
+        .group_by(model.id, model.upcoming_shows_count, model.past_shows_count) \
+        .having(or_(model.upcoming_shows_count != upcoming, model.past_shows_count != past)) \
+        .order_by(model.id).all()
+
+
+def fix_show_counters(model, mismatches):
+    # Overwrite the counters of mismatched owners with their recounted values
+    table = model.__table__
+    if mismatches:
+        db.session.execute(table.update().where(table.c.id == bindparam('owner_id')).values(
+            upcoming_shows_count=bindparam('upcoming'),
+            past_shows_count=bindparam('past')
+        ), [{'owner_id': owner_id, 'upcoming': upcoming, 'past': past} for owner_id, _, _, upcoming, past in mismatches])
+
+#----------------------------------------------------------------------------#
+# Last modified.
+#----------------------------------------------------------------------------#
+
+# Pages change when a row they show is written or deleted, and when one of
+# their shows starts and moves from upcoming to past. Each of these is a
+# MAX over an indexed column, so revalidating a page costs one small query.
+
+
+def _latest(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def _last_deletion():
+    return select([func.max(Deletion.deleted_at)]).as_scalar()
+
+
+def _last_started(now):
+    return func.max(Show.start_time).filter(Show.start_time <= now)
+
+
+def listing_last_modified(now):
+    # When any listing page last changed
+    row = db.session.query(
+        select([func.max(Venue.updated_at)]).as_scalar(),
+        select([func.max(Artist.updated_at)]).as_scalar(),
+        select([func.max(Show.updated_at)]).as_scalar(),
+        select([func.max(Show.start_time)]).where(Show.start_time <= now).as_scalar(),
+        _last_deletion()
+    ).one()
+    return _latest(*row)
+
+
+def venue_last_modified(venue_id, now):
+    # When the venue page last changed, or None if there is no such venue
+    row = db.session.query(
+        Venue.updated_at,
+        func.max(Show.updated_at),
+        func.max(Artist.updated_at),
+        _last_started(now),
+        _last_deletion()
+    ).outerjoin(Show, Show.venue_id == Venue.id) \
+        .outerjoin(Artist, Artist.id == Show.artist_id) \
+        .filter(Venue.id == venue_id) \
+        .group_by(Venue.id, Venue.updated_at).first()
+    return _latest(*row) if row else None
+
+
+def artist_last_modified(artist_id, now):
+    # When the artist page last changed, or None if there is no such artist
+    row = db.session.query(
+        Artist.updated_at,
+        func.max(Show.updated_at),
+        func.max(Venue.updated_at),
+        _last_started(now),
+        _last_deletion()
+    ).outerjoin(Show, Show.artist_id == Artist.id) \
+        .outerjoin(Venue, Venue.id == Show.venue_id) \
+        .filter(Artist.id == artist_id) \
+        .group_by(Artist.id, Artist.updated_at).first()
+    return _latest(*row) if row else None
+
+#----------------------------------------------------------------------------#
+# Pagination.
+#----------------------------------------------------------------------------#
+
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+
+Page = namedtuple('Page', ['items', 'next_cursor', 'prev_cursor', 'per_page'])
+
+
+def encode_cursor(direction, values):
+    # Opaque url-safe token holding the direction and the seek key values
+    values = [{'datetime': value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps([direction, values]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    # Invalid or missing cursors start from the first page
+    try:
+        direction, values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        values = [datetime.fromisoformat(value['datetime']) if isinstance(value, dict) else value for value in values]
+    except (AttributeError, TypeError, ValueError, KeyError):
+        return 'next', None
+    return ('prev' if direction == 'prev' else 'next'), values
+
+
+def page_size(per_page):
+    # Clamp the requested page size to [1, MAX_PER_PAGE]
+    try:
+        return min(max(int(per_page), 1), MAX_PER_PAGE)
+    except (TypeError, ValueError):
+        return DEFAULT_PER_PAGE
+
+
+def paginate(query, keys, cursor=None, per_page=None, descending=False):
+    # Keyset pagination: seek past the cursor's key values instead of using
+    # OFFSET, so deep pages cost the same as the first one. The keys must
+    # form a unique ordering and be readable as attributes of each row.
+    per_page = page_size(per_page)
+    direction, values = decode_cursor(cursor) if cursor else ('next', None)
+    backwards = direction == 'prev'
+    reverse = descending != backwards
+
+    # Seek past the cursor
+    if values is not None and len(values) == len(keys):
+        if reverse:
+            query = query.filter(tuple_(*keys) < tuple_(*values))
+        else:
+            query = query.filter(tuple_(*keys) > tuple_(*values))
+    else:
+        values = None
+
+    # Fetch one extra row to know whether there is a further page
+    items = query.order_by(*[key.desc() if reverse else key for key in keys]).limit(per_page + 1).all()
+    more = len(items) > per_page
+    items = items[:per_page]
+    if backwards:
+        items.reverse()
+
+    has_next = values is not None if backwards else more
+    has_prev = more if backwards else values is not None
+    return Page(
+        items,
+        encode_cursor('next', [getattr(items[-1], key.key) for key in keys]) if items and has_next else None,
+        encode_cursor('prev', [getattr(items[0], key.key) for key in keys]) if items and has_prev else None,
+        per_page
+    )
@@ -0,0 +1,64 @@
+import random
+from flask import g, has_app_context, request
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import orm
+from sqlalchemy.sql.expression import UpdateBase
+
+#----------------------------------------------------------------------------#
+# Replica routing.
+#----------------------------------------------------------------------------#
+
+# GET and HEAD requests read from one of the replica engines, the
+# SQLALCHEMY_BINDS whose keys start with 'replica'. Every other request,
+# CLI command and any flush or INSERT/UPDATE/DELETE runs on the primary.
+# After a write request the client gets a short lived cookie that keeps its
+# reads on the primary until the replicas have caught up with the write.
+
+PRIMARY_COOKIE = 'fyyur_primary'
+
+
+class RoutingSession(SignallingSession):
+
+    def __init__(self, db, **options):
+        self.db = db
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None):
+        replica = g.get('db_replica') if has_app_context() else None
+        if replica is not None and not self._flushing and not isinstance(clause, UpdateBase):
+            return self.db.get_engine(self.app, bind=replica)
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+class ReplicaRouter:
+    # Picks the engine for each request: a random replica for reads unless
+    # the client wrote recently, the primary otherwise
+
+    def __init__(self, app=None):
+        self.replicas = []
+        self.sticky_seconds = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.replicas = sorted(key for key in app.config.get('SQLALCHEMY_BINDS') or {} if key.startswith('replica'))
+        self.sticky_seconds = app.config.get('DATABASE_REPLICA_STICKY_SECONDS', 5)
+        app.before_request(self.route)
+        app.after_request(self.stick)
+        app.extensions['replica_router'] = self
+
+    def route(self):
+        if self.replicas and request.method in ('GET', 'HEAD') and PRIMARY_COOKIE not in request.cookies:
+            g.db_replica = random.choice(self.replicas)
+
+    def stick(self, response):
+        # Read your own writes: send the writer's next reads to the primary
+        if self.replicas and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            response.set_cookie(PRIMARY_COOKIE, '1', max_age=self.sticky_seconds, httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,141 @@
+from sqlalchemy import DDL, and_, column, event, false, func, literal, or_, select, table, true
+from enums import State
+from models import db, Venue, Artist, Show
+from queries import venue_listing, artist_listing, show_listing
+from search_ddl import SQLITE_FTS_DDL
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+# Name search is backed by pg_trgm GIN indexes on PostgreSQL and by FTS5
+# tables on SQLite (both created by migration), so a search is an index
+# lookup instead of a sequential ILIKE scan. Other databases fall back to
+# ILIKE with no ranking. Location search is an exact state match plus a
+# city prefix match, a range scan of the (state, lower(city)) indexes.
+
+# Keep databases built with db.create_all() searchable too
+SQLITE_SEARCH_DDL = SQLITE_FTS_DDL + ["CREATE INDEX IF NOT EXISTS ix_{table}_state_city ON {table} (state, lower(city))"]
+for model in (Venue, Artist):
+    for statement in SQLITE_SEARCH_DDL:
+        event.listen(model.__table__, 'after_create', DDL(statement.format(table=model.__tablename__)).execute_if(dialect='sqlite'))
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # Keep migration autogenerate from dropping the search indexes and
+    # tables, which only exist in the database
+    return not (reflected and compare_to is None and name and (name.endswith(('_trgm', '_state_city')) or '_fts' in name))
+
+
+def _dialect():
+    return db.session.get_bind().dialect.name
+
+
+def _fts_query(term):
+    # Every word must match as a prefix, quoted so FTS5 syntax is inert
+    return ' '.join('"{}"*'.format(word.replace('"', '""')) for word in term.split())
+
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _match(model, term):
+    # (criterion, rank) matching model.name against the term, where a
+    # higher rank is a better match
+    term = term.strip()
+    if not term:
+        return true(), literal(0).label('rank')
+
+    dialect = _dialect()
+    if dialect == 'sqlite':
+        fts = table(f'{model.__tablename__}_fts', column('rowid'), column('rank'), column(f'{model.__tablename__}_fts'))
+        criterion = and_(model.id == fts.c.rowid, fts.c[f'{model.__tablename__}_fts'].op('MATCH')(_fts_query(term)))
+        return criterion, (-fts.c.rank).label('rank')
+
+    criterion = model.name.ilike(f'%{_escape_like(term)}%', escape='\\')
+    if dialect == 'postgresql':
+        return criterion, db.func.word_similarity(term, model.name).label('rank')
+    return criterion, literal(0).label('rank')
+
+
+def _matching_ids(model, term):
+    criterion, _ = _match(model, term)
+    return select([model.id]).where(criterion)
+
+
+def parse_location(term):
+    # (city, state) from 'City, ST' or 'City ST', with the state resolved
+    # against enums.State; None when no valid state is given
+    term = ' '.join(term.split())
+    if ',' in term:
+        city, _, state = term.rpartition(',')
+    else:
+        city, _, state = term.rpartition(' ')
+    state = state.strip().upper()
+    if state not in State.__members__:
+        return None
+    return city.strip().lower(), State[state].value
+
+
+def _in_location(model, location):
+    # Exact state plus city prefix, in a form the location index serves
+    if location is None:
+        return false()
+    city, state = location
+    if not city:
+        return model.state == state
+    if _dialect() == 'postgresql':
+        # Served by the text_pattern_ops index
+        return and_(model.state == state, func.lower(model.city).like(f'{_escape_like(city)}%', escape='\\'))
+    # Binary range [city, successor of city) covers every name with the prefix
+    return and_(model.state == state, func.lower(model.city) >= city, func.lower(model.city) < city[:-1] + chr(ord(city[-1]) + 1))
+
+
+def search_venues(term, now=None):
+    # Venue listing rows matching the term and their rank column
+    criterion, rank = _match(Venue, term)
+    return venue_listing(now).add_columns(rank).filter(criterion), rank
+
+
+def search_artists(term, now=None):
+    # Artist listing rows matching the term and their rank column
+    criterion, rank = _match(Artist, term)
+    return artist_listing(now).add_columns(rank).filter(criterion), rank
+
+
+def search_venues_in(location, now=None):
+    # Venue listing rows in the parsed location
+    return venue_listing(now).filter(_in_location(Venue, location))
+
+
+def search_artists_in(location, now=None):
+    # Artist listing rows in the parsed location
+    return artist_listing(now).filter(_in_location(Artist, location))
+
+
+def shows_in(location):
+    # Criterion for shows whose artist or venue is in the parsed location
+    return or_(
+        Show.artist_id.in_(select([Artist.id]).where(_in_location(Artist, location))),
+        Show.venue_id.in_(select([Venue.id]).where(_in_location(Venue, location)))
+    )
+
+
+def shows_matching(term):
+    # Criterion for shows whose artist or venue matches the term, each side
+    # resolved through its own name index before touching shows
+    return or_(
+        Show.artist_id.in_(_matching_ids(Artist, term)),
+        Show.venue_id.in_(_matching_ids(Venue, term))
+    )
+
+
+def search_shows_in(location):
+    # Shows whose artist or venue is in the parsed location
+    return show_listing().filter(shows_in(location))
+
+
+def search_shows(term):
+    # Shows whose artist or venue matches the term
+    return show_listing().filter(shows_matching(term))
@@ -0,0 +1,20 @@
+#----------------------------------------------------------------------------#
+# Search DDL.
+#----------------------------------------------------------------------------#
+
+# The SQLite FTS5 tables behind name search, as statements formatted with
+# the table name, which search.py runs after db.create_all(). Migration
+# a84e6d0c52f1 keeps its own copy as it stood then, so a change here needs
+# a new migration for databases built by migration.
+
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(name, content='{table}', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN "
+    "INSERT INTO {table}_fts(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN "
+    "INSERT INTO {table}_fts({table}_fts, rowid, name) VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF name ON {table} BEGIN "
+    "INSERT INTO {table}_fts({table}_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+    "INSERT INTO {table}_fts(rowid, name) VALUES (new.id, new.name); END",
+    "INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')"
+]
@@ -0,0 +1,244 @@
+import hmac
+import json
+import threading
+import time
+from flask import abort, current_app, g, has_app_context, request
+from flask.signals import before_render_template, signals_available, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Request metrics.
+#----------------------------------------------------------------------------#
+
+# Every request gets a RequestMetrics on g that the engine events add each
+# statement to and the template signals add each render to. The query
+# executor carries it to its worker threads, so statements that overlap
+# all count and the SQL time can exceed the request's. Responses streamed
+# after the view returns, like exports, only count the work done up front.
+
+# Upper bounds in seconds of the request duration histogram
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class RequestMetrics:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement = None
+        self.template_time = 0.0
+        self.template_starts = []
+
+    def add_statement(self, statement, duration):
+        with self.lock:
+            self.sql_count += 1
+            self.sql_time += duration
+            if duration > self.slowest_time:
+                self.slowest_time = duration
+                self.slowest_statement = statement
+
+    def summary(self, duration):
+        # Milliseconds, with the slowest statement on one short line
+        statement = ' '.join(self.slowest_statement.split())[:200] if self.slowest_statement else None
+        return {
+            'duration_ms': round(duration * 1000, 2),
+            'sql_count': self.sql_count,
+            'sql_ms': round(self.sql_time * 1000, 2),
+            'sql_slowest_ms': round(self.slowest_time * 1000, 2),
+            'sql_slowest': statement,
+            'template_ms': round(self.template_time * 1000, 2)
+        }
+
+
+def current_metrics():
+    return g.get('request_metrics') if has_app_context() else None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_statement(conn, cursor, statement, parameters, context, executemany):
+    if current_metrics() is not None:
+        conn.info.setdefault('statement_starts', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def end_statement(conn, cursor, statement, parameters, context, executemany):
+    metrics = current_metrics()
+    starts = conn.info.get('statement_starts')
+    if metrics is not None and starts:
+        metrics.add_statement(statement, time.perf_counter() - starts.pop())
+
+
+@event.listens_for(Engine, 'handle_error')
+def drop_statement(context):
+    # A failed statement never reaches after_cursor_execute
+    starts = context.connection.info.get('statement_starts') if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+#----------------------------------------------------------------------------#
+# Prometheus.
+#----------------------------------------------------------------------------#
+
+
+def label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def labels(**values):
+    return '{' + ','.join(f'{name}="{label_value(value)}"' for name, value in values.items()) + '}'
+
+
+class Registry:
+    # Totals per endpoint since the process started. Each worker process
+    # keeps its own, so scrape every worker or sum them in Prometheus.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.endpoints = {}
+
+    def observe(self, endpoint, method, status, duration, metrics):
+        with self.lock:
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            totals = self.endpoints.setdefault(endpoint, {
+                'buckets': [0] * len(DURATION_BUCKETS),
+                'count': 0,
+                'duration': 0.0,
+                'sql_count': 0,
+                'sql_time': 0.0,
+                'sql_slowest': 0.0,
+                'template_time': 0.0
+            })
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    totals['buckets'][i] += 1
+            totals['count'] += 1
+            totals['duration'] += duration
+            totals['sql_count'] += metrics.sql_count
+            totals['sql_time'] += metrics.sql_time
+            totals['sql_slowest'] = max(totals['sql_slowest'], metrics.slowest_time)
+            totals['template_time'] += metrics.template_time
+
+    def exposition(self):
+        # The Prometheus text format, version 0.0.4
+        with self.lock:
+            requests = sorted(self.requests.items())
+            endpoints = sorted((endpoint, dict(totals, buckets=list(totals['buckets']))) for endpoint, totals in self.endpoints.items())
+
+        lines = [
+            '# HELP fyyur_requests_total Requests handled.',
+            '# TYPE fyyur_requests_total counter'
+        ]
+        lines += [f'fyyur_requests_total{labels(endpoint=endpoint, method=method, status=status)} {count}' for (endpoint, method, status), count in requests]
+
+        lines += [
+            '# HELP fyyur_request_duration_seconds Time from the first before_request to the last after_request handler.',
+            '# TYPE fyyur_request_duration_seconds histogram'
+        ]
+        for endpoint, totals in endpoints:
+            for bound, count in zip(DURATION_BUCKETS, totals['buckets']):
+                lines.append(f'fyyur_request_duration_seconds_bucket{labels(endpoint=endpoint, le=bound)} {count}')
+            lines.append(f'fyyur_request_duration_seconds_bucket{labels(endpoint=endpoint, le="+Inf")} {totals["count"]}')
+            lines.append(f'fyyur_request_duration_seconds_sum{labels(endpoint=endpoint)} {totals["duration"]}')
+            lines.append(f'fyyur_request_duration_seconds_count{labels(endpoint=endpoint)} {totals["count"]}')
+
+        for name, key, kind, description in (
+            ('fyyur_sql_queries_total', 'sql_count', 'counter', 'SQL statements executed by requests.'),
+            ('fyyur_sql_duration_seconds_total', 'sql_time', 'counter', 'Time requests spent executing SQL statements.'),
+            ('fyyur_sql_slowest_seconds', 'sql_slowest', 'gauge', 'Longest single SQL statement of any request.'),
+            ('fyyur_template_duration_seconds_total', 'template_time', 'counter', 'Time requests spent rendering templates.')
+        ):
+            lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+            lines += [f'{name}{labels(endpoint=endpoint)} {totals[key]}' for endpoint, totals in endpoints]
+        return '\n'.join(lines) + '\n'
+
+#----------------------------------------------------------------------------#
+# Telemetry.
+#----------------------------------------------------------------------------#
+
+
+def stats_authorized():
+    # Whether the request may read operational stats: it bears STATS_TOKEN,
+    # or no token is set and the app runs in debug mode
+    token = current_app.config.get('STATS_TOKEN')
+    if token:
+        return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    return current_app.debug
+
+
+class Telemetry:
+    # Times each request, logs one JSON line for it, reports it in a
+    # Server-Timing header and adds it to the totals served at /metrics
+
+    def __init__(self, app=None):
+        self.registry = Registry()
+        self.server_timing = True
+        self.slow_request_ms = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('TELEMETRY_ENABLED', True):
+            return
+        self.server_timing = app.config.get('TELEMETRY_SERVER_TIMING', True)
+        self.slow_request_ms = app.config.get('TELEMETRY_SLOW_REQUEST_MS', 500)
+        # Register before the other extensions, so the timing covers their
+        # before_request handlers and after_request handlers, which run in
+        # reverse order
+        app.before_request(self.start)
+        app.after_request(self.finish)
+        # Template timing needs blinker for Flask's signals
+        if signals_available:
+            before_render_template.connect(self.start_template, app)
+            template_rendered.connect(self.end_template, app)
+        app.add_url_rule('/metrics', 'metrics', self.metrics)
+        app.extensions['telemetry'] = self
+
+    def start(self):
+        g.request_metrics = RequestMetrics()
+
+    def start_template(self, sender, template, context, **extra):
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.template_starts.append(time.perf_counter())
+
+    def end_template(self, sender, template, context, **extra):
+        metrics = current_metrics()
+        if metrics is not None and metrics.template_starts:
+            metrics.template_time += time.perf_counter() - metrics.template_starts.pop()
+
+    def finish(self, response):
+        metrics = current_metrics()
+        if metrics is None:
+            return response
+        duration = time.perf_counter() - metrics.started
+        endpoint = request.endpoint or 'none'
+        self.registry.observe(endpoint, request.method, response.status_code, duration, metrics)
+
+        summary = metrics.summary(duration)
+        record = dict(method=request.method, path=request.path, endpoint=endpoint, status=response.status_code, **summary)
+        logger = current_app.logger.getChild('telemetry')
+        if self.slow_request_ms and summary['duration_ms'] >= self.slow_request_ms:
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
+
+        if self.server_timing:
+            response.headers.add('Server-Timing', ', '.join([
+                f'sql;dur={summary["sql_ms"]};desc="{summary["sql_count"]} queries"',
+                f'sql-slowest;dur={summary["sql_slowest_ms"]}',
+                f'template;dur={summary["template_ms"]}',
+                f'total;dur={summary["duration_ms"]}'
+            ]))
+        return response
+
+    def metrics(self):
+        # Per-endpoint traffic and timings, for the same callers as /cache/stats
+        if not stats_authorized():
+            abort(404)
+        return current_app.response_class(self.registry.exposition(), mimetype='text/plain; version=0.0.4')
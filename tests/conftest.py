@@ -0,0 +1,24 @@
+import os
+import sys
+import pytest
+
+# Select the testing profile before the app reads its config
+os.environ['FYYUR_CONFIG'] = 'testing'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as fyyur_app
+from models import db
+
+
+@pytest.fixture
+def app():
+    with fyyur_app.app_context():
+        db.create_all()
+        yield fyyur_app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,33 @@
+from cache import MemoryBackend
+from models import db, Venue
+
+
+def venue_form(name):
+    return {'name': name, 'city': 'Austin', 'state': 'TX', 'address': '1 Main St', 'phone': '123-123-1234', 'genres': ['Jazz'],
+            'image_link': 'https://example.com/venue.png', 'website_link': '', 'facebook_link': '', 'seeking_description': ''}
+
+
+def test_edit_invalidates_cached_page_and_etag(app, client, monkeypatch):
+    page_cache = app.extensions['page_cache']
+    monkeypatch.setattr(page_cache, 'backend', MemoryBackend())
+    venue = Venue(name='Old Name', city='Austin', state='TX', image_link='https://example.com/venue.png', seeking_talent=False)
+    db.session.add(venue)
+    db.session.commit()
+    path = f'/venues/{venue.id}'
+
+    # Cached after the first render, and revalidated with its ETag
+    first = client.get(path)
+    etag, _ = first.get_etag()
+    hits = page_cache.stats()['hits']
+    assert client.get(path).data == first.data
+    assert page_cache.stats()['hits'] == hits + 1
+    assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
+
+    assert client.post(f'{path}/edit', data=venue_form('New Name')).status_code == 302
+    # Renders the flashed message
+    client.get(path)
+
+    response = client.get(path, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_etag()[0] != etag
+    assert b'New Name' in response.data and b'Old Name' not in response.data
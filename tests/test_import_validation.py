@@ -0,0 +1,53 @@
+from datetime import datetime
+from forms import VenueForm, validate_records
+from importer import import_records
+from models import Artist
+
+VENUE = {
+    'name': ' The Musical Hop ',
+    'city': 'San Francisco',
+    'state': 'CA',
+    'address': '1015 Folsom Street',
+    'phone': '123-123-1234',
+    'genres': 'Jazz,Reggae',
+    'image_link': 'https://example.com/venue.png',
+    'website_link': 'https://www.themusicalhop.com',
+    'facebook_link': 'https://www.facebook.com/TheMusicalHop',
+    'seeking_talent': 'true',
+    'seeking_description': 'Looking for a band.'
+}
+
+ARTIST = {
+    'name': 'Guns N Petals',
+    'city': 'San Francisco',
+    'state': 'CA',
+    'phone': '326-123-5000',
+    'genres': ['RocknRoll'],
+    'image_link': 'https://example.com/artist.png',
+    'website_link': '',
+    'facebook_link': 'https://www.facebook.com/GunsNPetals',
+    'albums': 'First(Song a,Song b),Second(x)',
+    'seeking_venue': 'yes',
+    'seeking_description': 'Looking for shows.',
+    'available_times': '1',
+    'available_start': '2030-01-01T10:00:00',
+    'available_end': '2030-06-01T22:30:45'
+}
+
+
+def test_reused_form_validates_each_record_on_its_own(app):
+    records = [dict(VENUE, phone='bad'), VENUE, {key: value for key, value in VENUE.items() if key != 'name'}]
+    results = list(validate_records(VenueForm, records))
+    assert [sorted(errors) if errors else None for _, errors in results] == [['phone'], None, ['name']]
+    assert (results[1][0]['name'], results[1][0]['phone'], results[1][0]['genres']) == ('The Musical Hop', '123-123-1234', ['Jazz', 'Reggae'])
+
+
+def test_import_writes_validated_artists(app):
+    imported, rejected = import_records('artists', enumerate([ARTIST, dict(ARTIST, name='')], 1))
+    assert (imported, [number for number, _ in rejected]) == (1, [2])
+
+    artist = Artist.query.one()
+    assert (artist.name, artist.genres, artist.seeking_venue) == ('Guns N Petals', ['RocknRoll'], True)
+    assert (artist.available_start, artist.available_end) == (datetime(2030, 1, 1, 10, 0), datetime(2030, 6, 1, 22, 30))
+    assert [(album.name, [song.name for song in album.songs]) for album in artist.albums] == [('First', ['Song a', 'Song b']), ('Second', ['x'])]
+    assert artist.created_date is not None and artist.upcoming_shows_count == 0
@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta
+import pytest
+from models import db, Venue, Artist, Show
+from queries import COUNTER_OWNERS, roll_over_show_counters, show_booking, show_counter_mismatches
+
+START = datetime(2030, 6, 1, 20, 0)
+
+
+def add_artist_and_venue(available_start, available_end):
+    artist = Artist(name='Artist', city='Austin', state='TX', image_link='https://example.com/artist.png', seeking_venue=False,
+                    available_times=True, available_start=available_start, available_end=available_end)
+    venue = Venue(name='Venue', city='Austin', state='TX', image_link='https://example.com/venue.png', seeking_talent=False)
+    db.session.add_all([artist, venue])
+    db.session.commit()
+    return artist.id, venue.id
+
+
+def schedule(client, artist_id, venue_id, start_time):
+    return client.post(f'/api/v1/artists/{artist_id}/shows', json={'shows': [{'venue_id': venue_id, 'start_time': start_time.isoformat()}]})
+
+
+@pytest.mark.parametrize('available_start, available_end, open_time, closed_time', [
+    (None, START, datetime(2029, 1, 1), datetime(2031, 1, 1)),
+    (START, None, datetime(2031, 1, 1), datetime(2029, 1, 1)),
+    (None, None, datetime(2031, 1, 1), None)
+])
+def test_missing_availability_bound_is_open(app, client, available_start, available_end, open_time, closed_time):
+    artist_id, venue_id = add_artist_and_venue(available_start, available_end)
+    if closed_time is not None:
+        assert show_booking(artist_id, venue_id, closed_time).artist_available == False
+        assert schedule(client, artist_id, venue_id, closed_time).status_code == 422
+
+    assert show_booking(artist_id, venue_id, open_time).artist_available == True
+    assert schedule(client, artist_id, venue_id, open_time).status_code == 201
+
+
+def test_utc_offsets_are_rejected_per_row(app, client):
+    artist_id, venue_id = add_artist_and_venue(None, None)
+    response = client.post(f'/api/v1/artists/{artist_id}/shows', json={'shows': [
+        {'venue_id': venue_id, 'start_time': '2030-06-01T20:00:00'},
+        {'venue_id': venue_id, 'start_time': '2030-06-02T20:00:00+02:00'}
+    ]})
+    assert response.status_code == 422
+    assert [error['row'] for error in response.get_json()['errors']] == [2]
+
+    response = client.post(f'/artists/{artist_id}/schedule', data={'shows': f'{venue_id}, 2030-06-01T20:00\n{venue_id}, 2030-06-02T20:00Z'})
+    assert response.status_code == 200
+    assert b'Line 2 must be in the form' in response.data
+    assert Show.query.count() == 0
+
+
+def show_form(artist_id, venue_id, start_time):
+    return {'artist_id': artist_id, 'venue_id': venue_id, 'start_time': start_time.strftime('%Y-%m-%dT%H:%M')}
+
+
+def test_double_bookings_are_rejected(app, client):
+    artist_id, venue_id = add_artist_and_venue(None, None)
+    other_artist_id, other_venue_id = add_artist_and_venue(None, None)
+    assert schedule(client, artist_id, venue_id, START).status_code == 201
+
+    # The venue's slot, then the artist's, through the form and the API
+    response = client.post('/shows/create', data=show_form(other_artist_id, venue_id, START))
+    assert b'Venue is already booked at that time.' in response.data
+    response = client.post('/shows/create', data=show_form(artist_id, other_venue_id, START))
+    assert b'Artist is already booked at that time.' in response.data
+    response = schedule(client, artist_id, other_venue_id, START)
+    assert response.status_code == 422
+    assert response.get_json()['errors'] == [{'row': 1, 'errors': {'start_time': ['Artist is already booked at that time.']}}]
+
+    # An edit may keep its own slot but not take another show's
+    other = Show(artist_id=other_artist_id, venue_id=other_venue_id, start_time=START + timedelta(days=1))
+    db.session.add(other)
+    db.session.commit()
+    response = client.post(f'/shows/{other.id}/edit', data=show_form(other_artist_id, venue_id, START))
+    assert b'Venue is already booked at that time.' in response.data
+    assert client.post(f'/shows/{other.id}/edit', data=show_form(other_artist_id, other_venue_id, START + timedelta(days=1))).status_code == 302
+    assert Show.query.count() == 2
+
+
+def test_batch_reports_every_rejected_row(app, client):
+    artist_id, venue_id = add_artist_and_venue(START - timedelta(days=30), START + timedelta(days=30))
+    other_artist_id, other_venue_id = add_artist_and_venue(None, None)
+    db.session.add(Show(artist_id=other_artist_id, venue_id=other_venue_id, start_time=START + timedelta(days=1)))
+    db.session.commit()
+
+    response = client.post(f'/api/v1/artists/{artist_id}/shows', json={'shows': [
+        {'venue_id': venue_id, 'start_time': START.isoformat()},
+        {'venue_id': 999, 'start_time': (START + timedelta(days=2)).isoformat()},
+        {'venue_id': venue_id, 'start_time': START.isoformat()},
+        {'venue_id': venue_id, 'start_time': (START + timedelta(days=60)).isoformat()},
+        {'venue_id': other_venue_id, 'start_time': (START + timedelta(days=1)).isoformat()},
+        {'venue_id': venue_id}
+    ]})
+    assert response.status_code == 422
+    assert response.get_json()['errors'] == [
+        {'row': 2, 'errors': {'venue_id': ['No venue found with id 999.']}},
+        {'row': 3, 'errors': {'start_time': ['Artist is already booked at that time.', 'Venue is already booked at that time.']}},
+        {'row': 4, 'errors': {'start_time': ["Artist isn't avaliable at that time."]}},
+        {'row': 5, 'errors': {'start_time': ['Venue is already booked at that time.']}},
+        {'row': 6, 'errors': {'show': ['Show must have an integer venue_id and an ISO 8601 start_time with no UTC offset.']}}
+    ]
+
+    # The form reports the same rows by line and adds none of the shows
+    lines = [f'{venue_id}, {START:%Y-%m-%dT%H:%M}', f'999, {START + timedelta(days=2):%Y-%m-%dT%H:%M}', f'{venue_id}, {START:%Y-%m-%dT%H:%M}']
+    response = client.post(f'/artists/{artist_id}/schedule', data={'shows': '\n'.join(lines)})
+    assert b'Line 2: No venue found with id 999.' in response.data
+    assert b'Line 3: Artist is already booked at that time. Venue is already booked at that time.' in response.data
+    assert Show.query.count() == 1
+
+
+def test_counters_follow_edits_deletes_and_rollovers(app, client):
+    now = datetime.utcnow().replace(second=0, microsecond=0)
+    artist_id, venue_id = add_artist_and_venue(None, None)
+    _, other_venue_id = add_artist_and_venue(None, None)
+    for days in (-2, 1, 3):
+        assert client.post('/shows/create', data=show_form(artist_id, venue_id, now + timedelta(days=days))).status_code == 200
+
+    def counters(model, owner_id):
+        for owner_model, foreign_key in COUNTER_OWNERS:
+            assert show_counter_mismatches(owner_model, foreign_key) == []
+        return tuple(db.session.query(model.upcoming_shows_count, model.past_shows_count).filter(model.id == owner_id).one())
+
+    # Every show counts as upcoming until the first rollover
+    assert counters(Venue, venue_id) == (3, 0)
+    roll_over_show_counters(now)
+    db.session.commit()
+    assert counters(Venue, venue_id) == (2, 1)
+    assert counters(Artist, artist_id) == (2, 1)
+
+    # Moving a show to another venue, and back into the past
+    show_id = Show.query.filter(Show.start_time == now + timedelta(days=1)).one().id
+    assert client.post(f'/shows/{show_id}/edit', data=show_form(artist_id, other_venue_id, now + timedelta(days=1))).status_code == 302
+    assert counters(Venue, venue_id) == (1, 1)
+    assert counters(Venue, other_venue_id) == (1, 0)
+    assert client.post(f'/shows/{show_id}/edit', data=show_form(artist_id, other_venue_id, now - timedelta(days=1))).status_code == 302
+    assert counters(Venue, other_venue_id) == (0, 1)
+    assert counters(Artist, artist_id) == (1, 2)
+
+    # Deleting a show, then rolling over past the last upcoming one
+    assert client.delete(f'/shows/{show_id}').status_code == 303
+    assert counters(Venue, other_venue_id) == (0, 0)
+    roll_over_show_counters(now + timedelta(days=4))
+    db.session.commit()
+    assert counters(Venue, venue_id) == (0, 2)
+    assert counters(Artist, artist_id) == (0, 2)
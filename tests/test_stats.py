@@ -0,0 +1,12 @@
+import pytest
+
+
+@pytest.mark.parametrize('path', ['/metrics', '/cache/stats'])
+def test_stats_need_the_token(app, client, monkeypatch, path):
+    # Not served outside debug without a token
+    assert client.get(path).status_code == 404
+
+    monkeypatch.setitem(app.config, 'STATS_TOKEN', 's3cret')
+    assert client.get(path).status_code == 404
+    assert client.get(path, headers={'Authorization': 'Bearer wrong'}).status_code == 404
+    assert client.get(path, headers={'Authorization': 'Bearer s3cret'}).status_code == 200
@@ -0,0 +1,79 @@
+import html
+import re
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from models import db, Venue, Artist, Show
+
+
+def add_venues(areas, first_area=0, venues_per_area=2):
+    # venues_per_area venues in each of areas new cities, each with a past
+    # and an upcoming show
+    artist = Artist(name='Artist', city='Austin', state='TX', image_link='https://example.com/artist.png', seeking_venue=False, available_times=False)
+    db.session.add(artist)
+    now = datetime.utcnow()
+    for area in range(first_area, first_area + areas):
+        for number in range(venues_per_area):
+            venue = Venue(name=f'Venue {area}-{number}', city=f'City {area}', state='TX', image_link='https://example.com/venue.png', seeking_talent=False)
+            db.session.add_all([
+                venue,
+                Show(venue=venue, artist=artist, start_time=now - timedelta(days=area + 1, hours=number)),
+                Show(venue=venue, artist=artist, start_time=now + timedelta(days=area + 1, hours=number))
+            ])
+    db.session.commit()
+
+
+def count_queries(client, path):
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        response = client.get(path)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    assert response.status_code == 200
+    return len(statements), response
+
+
+def test_venues_page_queries_do_not_grow_with_areas(app, client):
+    add_venues(1)
+    one_area, _ = count_queries(client, '/venues?per_page=50')
+
+    add_venues(9, first_area=1)
+    many_areas, response = count_queries(client, '/venues?per_page=50')
+
+    assert many_areas == one_area
+    assert b'City 9' in response.data
+
+
+def test_venues_page_groups_venues_by_area_with_upcoming_counts(app, client):
+    add_venues(3)
+    _, response = count_queries(client, '/venues?per_page=50')
+    page = response.get_data(as_text=True)
+
+    # Areas in city order, each listing its own venues
+    assert page.index('City 0') < page.index('Venue 0-0') < page.index('City 1') < page.index('Venue 1-0')
+    assert page.count('City 2') == 1
+    # Each venue's own upcoming show, not its past one
+    assert page.count('has 1 upcoming show<') == 6
+
+
+def test_venue_page_links_keep_the_other_sections_cursor(app, client):
+    add_venues(1, venues_per_area=1)
+    venue = Venue.query.one()
+    now = datetime.utcnow()
+    db.session.add_all([Show(venue=venue, artist_id=1, start_time=now + timedelta(days=days)) for days in (5, 6)] +
+                       [Show(venue=venue, artist_id=1, start_time=now - timedelta(days=days)) for days in (5, 6)])
+    db.session.commit()
+
+    def next_links(page):
+        return [html.unescape(link) for link in re.findall(r'<li class="next"><a href="([^"]+)"', page.get_data(as_text=True))]
+
+    # Page on through the upcoming shows, then the past ones
+    upcoming_next, _ = next_links(client.get(f'/venues/{venue.id}?per_page=1'))
+    _, past_next = next_links(client.get(upcoming_next))
+    assert 'upcoming_cursor=' in past_next
+
+    upcoming_next, _ = next_links(client.get(past_next))
+    assert 'past_cursor=' in upcoming_next and 'per_page=1' in upcoming_next